@@ -0,0 +1,61 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from rdflib import Graph, URIRef
+from rdflib.namespace import OWL, RDF, RDFS
+
+from snapshot import open_snapshot, source_fingerprint, write_snapshot
+
+BASE_ONTOLOGY = os.path.join(ROOT, "Ontology.rdf")
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+EX = "http://www.semanticweb.org/ana/ontologies/2025/4/albania/"
+# Part of the cached datasets' fingerprint; bump it when scaled_triples changes
+DATASET_FORMAT = 2
+
+
+def load_base(path=BASE_ONTOLOGY):
+    graph = Graph()
+    graph.parse(path)
+    return graph
+
+
+def scaled_triples(graph, scale):
+    # `scale` copies of every individual under new IRIs (copy 0 keeps the originals); classes,
+    # properties and literals appear once, so the graph grows the way merged NLP output does
+    individuals = set(graph.subjects(RDF.type, OWL.NamedIndividual))
+    yield from graph
+    copied = [(s, p, o) for s, p, o in graph if s in individuals or o in individuals]
+    for i in range(1, scale):
+        rename = {s: URIRef(f"{s}_{i}") for s in individuals}
+        for s, p, o in copied:
+            yield rename.get(s, s), p, rename.get(o, o)
+
+
+def entity_names(graph, limit=50):
+    names = set()
+    for s in graph.subjects(RDF.type, OWL.NamedIndividual):
+        for label in graph.objects(s, RDFS.label):
+            names.add(str(label))
+        for label in graph.objects(s, URIRef(EX + "hasName")):
+            names.add(str(label))
+    return sorted(names)[:limit]
+
+
+def ensure_dataset(scale, base=BASE_ONTOLOGY, directory=DATA_DIR):
+    # N-Triples for merge.py and a snapshot for the SPARQL stand-in, rebuilt only when the base changes
+    os.makedirs(directory, exist_ok=True)
+    fingerprint = f"{source_fingerprint([base])}|x{scale}|v{DATASET_FORMAT}"
+    nt_path = os.path.join(directory, f"ontology_x{scale}.nt")
+    snapshot_path = os.path.join(directory, f"ontology_x{scale}.snapshot")
+    if os.path.exists(nt_path) and open_snapshot(snapshot_path, fingerprint) is not None:
+        return nt_path, snapshot_path
+    graph = load_base(base)
+    triples = list(scaled_triples(graph, scale))
+    with open(nt_path, "w", encoding="utf-8") as f:
+        for s, p, o in triples:
+            f.write(f"{s.n3()} {p.n3()} {o.n3()} .\n")
+    write_snapshot(triples, snapshot_path, fingerprint)
+    return nt_path, snapshot_path
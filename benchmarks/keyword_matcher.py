@@ -0,0 +1,206 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "nlp"))
+
+from keywords import CLASS_RULES, SentenceFeatures, classify
+
+
+# Reference copies of the rules as they were before the rule tables, used for parity and timing
+
+def legacy_enrich(context_text, class_type):
+    data = {}
+    text = context_text.lower()
+
+    # Religion
+    if class_type in ["OrthodoxChurch", "CatholicChurch", "Mosque", "Monastery", "PilgrimageSite"]:
+        if "orthodox" in text:
+            data["hasReligion"] = "Orthodox Christianity"
+        elif "catholic" in text:
+            data["hasReligion"] = "Catholicism"
+        elif "islamic" in text or "muslim" in text:
+            data["hasReligion"] = "Islam"
+
+    # Architectural style
+    if "byzantine" in text:
+        data["hasArchitecturalStyle"] = "Byzantine"
+    elif "islamic architecture" in text or "ottoman" in text:
+        data["hasArchitecturalStyle"] = "Islamic"
+    elif "roman" in text:
+        data["hasArchitecturalStyle"] = "Roman"
+
+    # Creator
+    if "commissioned by" in text:
+        try:
+            after = text.split("commissioned by", 1)[1]
+            creator = after.split(".")[0].strip()
+            data["hasCreator"] = creator.title()
+        except:
+            pass
+    elif "built by" in text:
+        try:
+            after = text.split("built by", 1)[1]
+            creator = after.split(".")[0].strip()
+            data["hasCreator"] = creator.title()
+        except:
+            pass
+
+    # Cultural context
+    if "medieval" in text:
+        data["hasCulturalContext"] = "Medieval Period"
+    elif "byzantine era" in text or "byzantine rule" in text:
+        data["hasCulturalContext"] = "Byzantine Period"
+    elif "roman" in text:
+        data["hasCulturalContext"] = "Roman Period"
+    elif "ottoman" in text:
+        data["hasCulturalContext"] = "Ottoman Period"
+
+    # Cultural significance
+    if "symbol" in text or "represents" in text or "important" in text:
+        data["hasCulturalSignificance"] = "Important cultural monument"
+
+    # Heritage status
+    if "unesco" in text:
+        data["hasCulturalHeritageStatus"] = "UNESCO World Heritage Site"
+    elif "national heritage" in text:
+        data["hasCulturalHeritageStatus"] = "National Heritage"
+
+    # Date of discovery
+    if "rediscovered" in text:
+        try:
+            parts = text.split("rediscovered")[1]
+            if "in" in parts:
+                year = parts.split("in")[1].split()[0]
+                if year.isdigit():
+                    data["hasDateOfDiscovery"] = year
+        except:
+            pass
+
+    return data
+
+def legacy_classify(ent_text, ent_label=None):
+    text = ent_text.lower()
+    if "orthodox" in text and "church" in text:
+        return "OrthodoxChurch"
+    elif "catholic" in text and "church" in text:
+        return "CatholicChurch"
+    elif "mosque" in text:
+        return "Mosque"
+    elif "monastery" in text:
+        return "Monastery"
+    elif "pilgrimage" in text or "shrine" in text:
+        return "PilgrimageSite"
+    elif "castle" in text or "fortress" in text:
+        return "CastleOrFortress"
+    elif "tomb" in text or "burial" in text:
+        return "TombOrBurialMound"
+    elif "rock art" in text or "inscription" in text:
+        return "RockArtOrInscription"
+    elif "ancient city" in text or "ruins" in text or "city" in text:
+        return "AncientCity"
+    elif ent_label == "GPE":
+        return "Region" if "region" in text else "City"
+    elif "war" in text or "battle" in text or "uprising" in text or "awakening" in text:
+        return "HistoricEvent"
+    return None
+
+
+SAMPLE_TEXT = """
+The Orthodox Church of Saint Nicholas, located in the city of Voskopoja, was built in the 18th century.
+It is dedicated to the Orthodox Christian religion and reflects the Byzantine architectural style.
+This church, commissioned by local artisans during the Ottoman Empire, is considered a symbol of Albania's Christian cultural identity and heritage.
+The Castle of Gjirokaster, a medieval fortress built in the 12th century, dominates the southern city of Gjirokaster.
+Constructed during the Byzantine era and later expanded by Ali Pasha of Tepelena, the castle served military and administrative purposes.
+It played a strategic role during the Albanian National Awakening, a major 19th-century historical event.
+The Et'hem Bey Mosque, located in Tirana, was built in the early 19th century by local masters.
+It is known for its intricate Islamic frescoes and Ottoman architectural style.
+It remains a sacred religious building for the Muslim community and represents an important cultural and historical monument in Albania.
+The ruins of the ancient city of Butrint date back to the 7th century BC and were once a Roman city under Byzantine rule.
+It was rediscovered by Italian archaeologist Luigi Maria Ugolini in 1928 and declared a UNESCO World Heritage Site in 1992.
+The Catholic Church of Shkoder and the shrine of Laç are pilgrimage sites of national heritage.
+A burial mound, a tomb with rock art and an inscription survive near the battle field of the uprising and the war.
+"""
+
+CLASSES = [rule[0] for rule in CLASS_RULES] + ["Date", None]
+
+
+def make_corpus(n, kind="sample", seed=0):
+    # "sample": the description sentences themselves; "random": word salad drawn from them
+    rng = random.Random(seed)
+    sentences = [s.strip() for s in SAMPLE_TEXT.strip().split("\n")]
+    if kind == "sample":
+        return [rng.choice(sentences) for _ in range(n)]
+    words = " ".join(sentences).split()
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(8, 40))) + "." for _ in range(n)]
+
+
+def chunks_of(sentence, size=3):
+    words = sentence.split()
+    return [" ".join(words[i:i + size]) for i in range(0, len(words), size)]
+
+
+def check_parity(corpus):
+    for sentence in corpus:
+        features = SentenceFeatures(sentence)
+        for class_type in CLASSES:
+            assert features.enrich(class_type) == legacy_enrich(sentence, class_type), (sentence, class_type)
+        for chunk in chunks_of(sentence) + [sentence]:
+            for label in (None, "GPE"):
+                assert classify(chunk, label) == legacy_classify(chunk, label), (chunk, label)
+
+
+def run_legacy(corpus):
+    for sentence, chunks in corpus:
+        for chunk in chunks:
+            class_type = legacy_classify(chunk)
+            if class_type:
+                legacy_enrich(sentence, class_type)
+
+
+def run_matcher(corpus):
+    for sentence, chunks in corpus:
+        features = None
+        for chunk in chunks:
+            class_type = classify(chunk)
+            if class_type:
+                if features is None:
+                    features = SentenceFeatures(sentence)
+                features.enrich(class_type)
+
+
+def best_of(fn, corpus, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(corpus)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure(kind, n, repeat):
+    sentences = make_corpus(n, kind)
+    check_parity(sentences)
+    corpus = [(sentence, chunks_of(sentence)) for sentence in sentences]
+    legacy = best_of(run_legacy, corpus, repeat) / len(corpus) * 1e6
+    matcher = best_of(run_matcher, corpus, repeat) / len(corpus) * 1e6
+    classified = sum(1 for _, chunks in corpus for chunk in chunks if legacy_classify(chunk)) / len(corpus)
+    print(f"{kind}: {len(corpus)} sentences, {classified:.2f} classified chunks per sentence")
+    print(f"  legacy:   {legacy:8.2f} us/sentence")
+    print(f"  matcher:  {matcher:8.2f} us/sentence")
+    print(f"  speedup:  {legacy / matcher:8.2f}x")
+    return {"legacy_us": legacy, "matcher_us": matcher}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-sentence cost of keyword classification and enrichment.")
+    parser.add_argument("--sentences", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    return {kind: measure(kind, args.sentences, args.repeat) for kind in ("sample", "random")}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(ROOT, "nlp"))
+
+from datasets import ensure_dataset, entity_names, load_base
+from web_throughput import measure
+
+BASELINE_FILE = os.path.join(HERE, "baseline.json")
+RESULTS_FILE = os.path.join(HERE, "results.json")
+
+# Vocabulary for the generated corpus; the sentences read like the descriptions ingest.py is fed
+SITES = ["Castle of {}", "Church of Saint {}", "Mosque of {}", "Monastery of {}", "Ancient city of {}",
+         "Tomb of {}", "Fortress of {}", "Orthodox Church of {}"]
+SAINTS = ["Nicholas", "Mary", "George", "Demetrius", "Athanasius", "Paraskevi", "Michael", "John"]
+PLACES = ["Berat", "Gjirokastër", "Korçë", "Shkodër", "Durrës", "Vlorë", "Krujë", "Elbasan", "Tirana",
+          "Përmet", "Sarandë", "Lezhë"]
+CENTURIES = ["4th century BC", "2nd century", "6th century", "13th century", "15th century", "18th century"]
+CONTEXTS = ["Byzantine", "Ottoman", "Illyrian", "Roman", "Venetian", "Hellenistic"]
+EVENTS = ["the Siege of Shkodra", "the League of Lezhë", "the Battle of Berat", "the Ottoman conquest"]
+TEMPLATES = [
+    "The {site} in {place} was built in the {century} and is a {context} monument.",
+    "{site} stands near {place} and was restored after {event}.",
+    "Archaeologists discovered the {site} in {place}, dating from the {century}.",
+    "The {context} frescoes of the {site} were painted by Onufri in the {century}.",
+    "During {event} the {site} served as a refuge for the people of {place}.",
+    "{place} is a city in Albania known for the {site}, a UNESCO World Heritage Site.",
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(url, process, timeout=120.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise Exception(f"Process exited with code {process.returncode} before {url} was ready")
+        try:
+            if requests.get(url, timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise Exception(f"Timed out waiting for {url}")
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def site_name(rng):
+    site = rng.choice(SITES)
+    return site.format(rng.choice(SAINTS if "Saint" in site else PLACES))
+
+
+def make_corpus(n, seed=0):
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(n):
+        sentences = [rng.choice(TEMPLATES).format(site=site_name(rng), place=rng.choice(PLACES),
+                                                  century=rng.choice(CENTURIES), context=rng.choice(CONTEXTS),
+                                                  event=rng.choice(EVENTS))
+                     for _ in range(rng.randint(3, 6))]
+        docs.append(" ".join(sentences))
+    return docs
+
+
+def make_entities(n, seed=0):
+    # What NLP.py emits for a corpus, without needing the spaCy model
+    from NLP import individual_name
+    rng = random.Random(seed)
+    entities = []
+    for i in range(n):
+        name = f"{site_name(rng)} {seed}-{i}"
+        data = {"hasName": name, "hasCulturalContext": rng.choice(CONTEXTS)}
+        entities.append((individual_name(name), "CastleOrFortress", data, {"locatedIn": rng.choice(PLACES)}))
+    return entities
+
+
+def bench_web(scales, concurrency, duration, latency, workers, cache):
+    metrics = {}
+    for scale in scales:
+        _, snapshot_path = ensure_dataset(scale)
+        names = entity_names(load_base())
+        sparql_port, web_port = free_port(), free_port()
+        endpoint = f"http://127.0.0.1:{sparql_port}/sparql"
+        standin = subprocess.Popen([sys.executable, os.path.join(HERE, "sparql_standin.py"), "--snapshot",
+                                    snapshot_path, "--port", str(sparql_port), "--latency", str(latency)])
+        service = None
+        try:
+            wait_until_ready(f"{endpoint}?query=ASK%7B%7D", standin)
+            env = dict(os.environ, SPARQL_BACKEND="remote", FUSEKI_ENDPOINT=endpoint,
+                       BIND=f"127.0.0.1:{web_port}", WEB_WORKERS=str(workers), SLOW_QUERY_MS="", PROFILE_STORE="",
+                       CACHE_MAX_ENTRIES=os.environ.get("CACHE_MAX_ENTRIES", "2048") if cache else "0")
+            service = subprocess.Popen([sys.executable, os.path.join(ROOT, "serve.py")], cwd=ROOT, env=env,
+                                       stderr=subprocess.DEVNULL)
+            url = f"http://127.0.0.1:{web_port}/"
+            wait_until_ready(url, service)
+            # One request first so index building is not counted
+            requests.post(url, data={"name": names[0]}, timeout=300)
+            print(f" home() at x{scale}")
+            for c in concurrency:
+                result = measure(url, names, c, duration)
+                for key in ("req_per_sec", "p50_ms", "p95_ms", "p99_ms", "errors"):
+                    metrics[f"web.x{scale}.c{c}.{key}"] = result[key]
+        finally:
+            if service is not None:
+                stop(service)
+            stop(standin)
+    return metrics
+
+
+def bench_nlp(docs, batch_size):
+    import NLP
+    from ingest import iter_entities
+    try:
+        NLP.get_nlp()
+    except OSError as e:
+        return {}, f"spaCy model '{NLP.MODEL_NAME}' is not installed ({e})"
+    corpus = make_corpus(docs)
+    metrics = {}
+
+    NLP.registry.clear()
+    start = time.perf_counter()
+    entities = sum(len(NLP.process_text(text)) for text in corpus)
+    elapsed = time.perf_counter() - start
+    metrics["nlp.process_text.docs_per_sec"] = len(corpus) / elapsed
+    print(f" process_text  {len(corpus) / elapsed:8.1f} docs/sec   {entities} entities")
+
+    NLP.registry.clear()
+    start = time.perf_counter()
+    entities = sum(1 for _ in iter_entities(corpus, batch_size=batch_size))
+    elapsed = time.perf_counter() - start
+    metrics["nlp.pipe.docs_per_sec"] = len(corpus) / elapsed
+    print(f" nlp.pipe      {len(corpus) / elapsed:8.1f} docs/sec   {entities} entities")
+    return metrics, None
+
+
+def bench_merge(scales, entities):
+    from NLP import individual_name, ontology_schema
+    from merge import merge
+    from rdf_writer import RDFWriter
+    metrics = {}
+    for scale in scales:
+        nt_path, _ = ensure_dataset(scale)
+        with tempfile.TemporaryDirectory() as tmp:
+            batches = []
+            for i in range(2):
+                path = os.path.join(tmp, f"nlp_output_{i}.ttl")
+                with RDFWriter(path, ontology_schema, individual_name) as writer:
+                    writer.write_all(make_entities(entities, seed=i))
+                batches.append(path)
+            merged = os.path.join(tmp, "merged.ttl")
+            runs = [("cold_s", batches[0], True), ("noop_s", batches[0], False), ("incremental_s", batches[1], False)]
+            timings = []
+            for key, path, force in runs:
+                start = time.perf_counter()
+                delta = merge(nt_path, path, merged, force=force)
+                elapsed = time.perf_counter() - start
+                metrics[f"merge.x{scale}.{key}"] = elapsed
+                timings.append(f"{key[:-2]} {elapsed * 1000:8.1f} ms ({len(delta)} triples)")
+        print(f" merge.py at x{scale}   " + "   ".join(timings))
+    return metrics
+
+
+def higher_is_better(key):
+    return key.endswith("_per_sec")
+
+
+def compare(metrics, baseline, tolerance):
+    regressions = []
+    for key, value in sorted(metrics.items()):
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if higher_is_better(key):
+            worse = value < base * (1 - tolerance)
+        else:
+            worse = value > base * (1 + tolerance)
+        if worse:
+            change = (value - base) / base * 100 if base else float("inf")
+            regressions.append({"metric": key, "baseline": base, "value": value, "change_pct": change})
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Explorer and NLP pipeline benchmarks against a local SPARQL stand-in.")
+    parser.add_argument("--suites", nargs="+", choices=["web", "nlp", "merge"], default=["web", "nlp", "merge"])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="copies of Ontology.rdf's individuals (1000 takes several minutes and GBs of memory)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.002, help="seconds the SPARQL stand-in adds per query")
+    parser.add_argument("--workers", type=int, default=1, help="serve.py worker processes")
+    parser.add_argument("--cache", action="store_true", help="keep the query cache on (off by default so "
+                                                              "every request reaches the SPARQL stand-in)")
+    parser.add_argument("--docs", type=int, default=200, help="documents in the generated NLP corpus")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--merge-entities", type=int, default=500, help="individuals per merged NLP output")
+    parser.add_argument("-o", "--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed change before a metric is flagged")
+    args = parser.parse_args(argv)
+
+    metrics, skipped = {}, {}
+    if "web" in args.suites:
+        metrics.update(bench_web(args.scales, args.concurrency, args.duration, args.latency, args.workers, args.cache))
+    if "nlp" in args.suites:
+        nlp_metrics, reason = bench_nlp(args.docs, args.batch_size)
+        metrics.update(nlp_metrics)
+        if reason:
+            skipped["nlp"] = reason
+            print(f" Skipped nlp: {reason}")
+    if "merge" in args.suites:
+        metrics.update(bench_merge(args.scales, args.merge_entities))
+
+    results = {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "save_baseline")},
+        "metrics": metrics,
+        "skipped": skipped,
+        "regressions": [],
+    }
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        results["baseline"] = {"date": baseline.get("date"), "commit": baseline.get("commit")}
+        results["regressions"] = compare(metrics, baseline["metrics"], args.tolerance)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f" Results written to '{args.output}'")
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f" Baseline saved to '{args.baseline}'")
+
+    for r in results["regressions"]:
+        print(f" REGRESSION {r['metric']}: {r['baseline']:.3f} -> {r['value']:.3f} ({r['change_pct']:+.1f}%)")
+    return 1 if results["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
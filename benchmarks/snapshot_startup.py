@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from rdflib import Graph, URIRef
+from rdflib.namespace import OWL, RDF
+
+from snapshot import parse_sources, source_fingerprint, write_snapshot
+
+DEFAULT_SOURCES = [os.path.join(ROOT, "Ontology.rdf"), os.path.join(ROOT, "nlp", "final_merged_output.ttl")]
+
+# What the service asks first for a page: every property of one individual
+PROFILE_QUERY = """
+SELECT ?prop ?val WHERE {
+  ?s a <http://www.w3.org/2002/07/owl#NamedIndividual> .
+  ?s ?prop ?val .
+} LIMIT 200
+"""
+
+
+def rss_kib():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child(mode, snapshot_path, sources):
+    # Runs in a fresh interpreter so start-up cost and memory are not shared between modes
+    from snapshot import open_snapshot
+    base = rss_kib()
+    start = time.perf_counter()
+    graph = parse_sources(sources) if mode == "parse" else open_snapshot(snapshot_path)
+    loaded = time.perf_counter()
+    rows = len(list(graph.query(PROFILE_QUERY)))
+    queried = time.perf_counter()
+    print(json.dumps({"load_s": loaded - start, "first_query_s": queried - loaded,
+                      "rows": rows, "rss_kib": rss_kib() - base}))
+
+
+def scaled_sources(sources, scale, directory):
+    # Copies of every individual under new IRIs, so the graph grows the way merged NLP output does
+    if scale == 1:
+        return sources
+    graph = parse_sources(sources)
+    individuals = set(graph.subjects(RDF.type, OWL.NamedIndividual))
+    scaled = Graph()
+    for i in range(scale):
+        rename = {s: URIRef(f"{s}_{i}") for s in individuals} if i else {}
+        for s, p, o in graph:
+            scaled.add((rename.get(s, s), p, rename.get(o, o)))
+    path = os.path.join(directory, f"scaled_{scale}.ttl")
+    scaled.serialize(path, format="turtle")
+    return [path]
+
+
+def run_child(mode, snapshot_path, sources):
+    output = subprocess.run([sys.executable, __file__, "--child", mode, "--snapshot", snapshot_path] + sources,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def measure(sources, scale, directory, repeat):
+    sources = scaled_sources(sources, scale, directory)
+    snapshot_path = os.path.join(directory, f"scaled_{scale}.snapshot")
+    start = time.perf_counter()
+    triples = write_snapshot(parse_sources(sources), snapshot_path, source_fingerprint(sources))
+    build = time.perf_counter() - start
+    results = {"triples": triples, "build_s": build, "text_bytes": sum(os.path.getsize(p) for p in sources),
+               "snapshot_bytes": os.path.getsize(snapshot_path)}
+    print(f"x{scale}: {triples} triples, snapshot {results['snapshot_bytes'] / 1024:.0f} KiB built in {build:.2f}s")
+    for mode in ("parse", "snapshot"):
+        runs = [run_child(mode, snapshot_path, sources) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r["load_s"])
+        results[mode] = best
+        print(f"  {mode:8} load {best['load_s'] * 1000:9.1f} ms   first query {best['first_query_s'] * 1000:8.1f} ms"
+              f"   RSS +{best['rss_kib'] / 1024:7.1f} MiB")
+    print(f"  start-up speedup: {results['parse']['load_s'] / results['snapshot']['load_s']:.0f}x")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Start-up time and memory of parsing the ontology vs mapping a snapshot.")
+    parser.add_argument("sources", nargs="*", default=DEFAULT_SOURCES)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10], help="copies of the individuals to load")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=["parse", "snapshot"], help=argparse.SUPPRESS)
+    parser.add_argument("--snapshot", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return child(args.child, args.snapshot, args.sources)
+    with tempfile.TemporaryDirectory() as directory:
+        return {scale: measure(args.sources, scale, directory, args.repeat) for scale in args.scale}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datasets import ensure_dataset
+from snapshot import open_snapshot
+
+# Answers SPARQL queries the way Fuseki's /sparql endpoint does, from a snapshot of a (scaled) dataset.
+# `latency` is added to every response to model the network hop and Fuseki's own overhead.
+
+
+def make_handler(graph, latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.answer(parse_qs(urlparse(self.path).query).get("query", [None])[0])
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+            if self.headers.get("Content-Type", "").startswith("application/sparql-query"):
+                self.answer(body)
+            else:
+                self.answer(parse_qs(body).get("query", [None])[0])
+
+        def answer(self, query):
+            if not query:
+                return self.reply(400, b"Missing query", "text/plain")
+            if latency:
+                time.sleep(latency)
+            try:
+                data = graph.query(query).serialize(format="json")
+            except Exception as e:
+                return self.reply(400, str(e).encode("utf-8"), "text/plain")
+            self.reply(200, data, "application/sparql-results+json")
+
+        def reply(self, status, data, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def serve(snapshot_path, port, latency=0.0, host="127.0.0.1"):
+    graph = open_snapshot(snapshot_path)
+    if graph is None:
+        raise Exception(f"Cannot open snapshot: {snapshot_path}")
+    server = ThreadingHTTPServer((host, port), make_handler(graph, latency))
+    server.daemon_threads = True
+    print(f" SPARQL stand-in for {len(graph)} triples on http://{host}:{port}/sparql", flush=True)
+    server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the Fuseki SPARQL endpoint.")
+    parser.add_argument("--scale", type=int, default=1, help="copies of Ontology.rdf's individuals")
+    parser.add_argument("--snapshot", help="serve this snapshot instead of a scaled Ontology.rdf")
+    parser.add_argument("--port", type=int, default=3030)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args(argv)
+    serve(args.snapshot or ensure_dataset(args.scale)[1], args.port, args.latency)
+
+
+if __name__ == "__main__":
+    main()
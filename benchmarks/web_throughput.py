@@ -0,0 +1,77 @@
+import argparse
+import random
+import threading
+import time
+
+import requests
+
+# Entity pages the explorer is most often asked for
+DEFAULT_NAMES = ["Butrint", "Berat", "Gjirokastër", "Castle", "Mosque", "Church", "Apollonia", "Rozafa",
+                 "Durrës", "Krujë", "Skanderbeg", "Iliria", "Onufri", "Korçë", "Shkodër", "Vlorë"]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def worker(url, names, deadline, latencies, errors, seed):
+    rng = random.Random(seed)
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = session.post(url, data={"name": rng.choice(names)}, timeout=60)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(1)
+    session.close()
+
+
+def measure(url, names, concurrency, duration):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=worker, args=(url, names, deadline, latencies, errors, i))
+               for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    result = {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "req_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+    print(f"  {concurrency:4} users  {result['req_per_sec']:8.1f} req/s   p50 {result['p50_ms']:7.1f} ms"
+          f"   p95 {result['p95_ms']:7.1f} ms   p99 {result['p99_ms']:7.1f} ms   errors {result['errors']}")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Requests per second the explorer sustains under concurrent users.")
+    parser.add_argument("--url", default="http://127.0.0.1:5002/")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--names", nargs="+", default=DEFAULT_NAMES, help="entity names to search for")
+    args = parser.parse_args(argv)
+
+    # One request first so index building is not counted
+    requests.post(args.url, data={"name": args.names[0]}, timeout=120)
+    print(f"{args.url}")
+    return [measure(args.url, args.names, c, args.duration) for c in args.concurrency]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from rdflib import Graph
+
+# Bytes before the last processed offset that must be unchanged for an appended tail to be read as a delta
+TAIL_BYTES = 4096
+
+
+def _tail_digest(f, size):
+    start = max(0, size - TAIL_BYTES)
+    f.seek(start)
+    return hashlib.blake2b(f.read(size - start), digest_size=16).hexdigest()
+
+
+def file_state(path):
+    # Size of the file and a digest of its last bytes; None when it does not exist
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            return {"size": size, "tail": _tail_digest(f, size)}
+    except OSError:
+        return None
+
+
+def files_state(paths):
+    return {path: file_state(path) for path in paths}
+
+
+def _read_tail(path, state):
+    # N-Triples appended to `path` since `state`, or None when the file was rewritten instead
+    # (merge.py only ever appends N-Triples lines, unless it rebuilds the file from scratch)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < state["size"] or _tail_digest(f, state["size"]) != state["tail"]:
+            return None
+        f.seek(state["size"])
+        return f.read(size - state["size"])
+
+
+def read_appended(paths, states):
+    # Triples appended to `paths` since `states` were recorded, and their new states. None means the
+    # change cannot be told from the files: one was rewritten or is new, or nothing was appended at all
+    # (the dataset changed some other way)
+    new_states = files_state(paths)
+    if not paths or not states or set(states) != set(paths):
+        return None, new_states
+    data = []
+    try:
+        for path in paths:
+            if states[path] is None or new_states[path] is None:
+                return None, new_states
+            tail = _read_tail(path, states[path])
+            if tail is None:
+                return None, new_states
+            data.append(tail)
+    except OSError:
+        return None, new_states
+    graph = Graph()
+    try:
+        graph.parse(data=b"\n".join(data).decode("utf-8"), format="nt")
+    except Exception:
+        return None, new_states
+    return list(graph) or None, new_states
+
+
+class ProfileStore:
+    # Entity profiles as JSON in SQLite, shared by every worker process. `version` is the dataset version
+    # the store reflects; entities in `pending` are waiting to be rebuilt for it and are not served
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._db().executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS profiles (uri TEXT PRIMARY KEY, profile TEXT NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS pending (uri TEXT PRIMARY KEY, generation INTEGER NOT NULL) WITHOUT ROWID;
+        """)
+
+    def _db(self):
+        # One connection per thread; WAL lets readers in every process run alongside the refresher
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get_meta(self, key):
+        row = self._db().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, uri, version):
+        # The stored profile, unless the store is behind `version` or the entity is waiting to be rebuilt
+        row = self._db().execute("""
+            SELECT profile FROM profiles
+            WHERE uri = ? AND NOT EXISTS (SELECT 1 FROM pending WHERE uri = ?)
+              AND (SELECT value FROM meta WHERE key = 'version') = ?
+        """, (uri, uri, version)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def queue(self, uris, version=None, delta=None, replace=False):
+        # Marks entities for rebuilding and, in the same transaction, records the version they belong to.
+        # replace=True makes `uris` the complete set of entities and drops every other profile
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            generation = int(self._meta(db, "generation") or 0) + 1
+            self._set_meta(db, "generation", str(generation))
+            db.executemany("INSERT OR REPLACE INTO pending VALUES (?, ?)", ((uri, generation) for uri in uris))
+            if replace:
+                db.execute("DELETE FROM pending WHERE generation != ?", (generation,))
+                db.execute("DELETE FROM profiles WHERE uri NOT IN (SELECT uri FROM pending)")
+            if version is not None:
+                self._set_meta(db, "version", version)
+            if delta is not None:
+                self._set_meta(db, "delta", json.dumps(delta))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def claim(self, limit):
+        return self._db().execute("SELECT uri, generation FROM pending ORDER BY generation, uri LIMIT ?",
+                                  (limit,)).fetchall()
+
+    def put(self, results):
+        # results: (uri, generation, profile). An entity queued again while it was being rebuilt stays pending
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for uri, generation, profile in results:
+                db.execute("INSERT OR REPLACE INTO profiles VALUES (?, ?)",
+                           (uri, json.dumps(profile, ensure_ascii=False, separators=(",", ":"))))
+                db.execute("DELETE FROM pending WHERE uri = ? AND generation = ?", (uri, generation))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def acquire_lease(self, owner, ttl):
+        # Only one process refreshes the store at a time; the lease lapses if its holder dies
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            lease = self._meta(db, "lease")
+            holder, expires = lease.split(" ") if lease else (None, "0")
+            acquired = holder == owner or float(expires) < time.time()
+            if acquired:
+                self._set_meta(db, "lease", f"{owner} {time.time() + ttl}")
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return acquired
+
+    def release_lease(self, owner):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        lease = self._meta(db, "lease")
+        if lease and lease.split(" ")[0] == owner:
+            db.execute("DELETE FROM meta WHERE key = 'lease'")
+        db.execute("COMMIT")
+
+    def stats(self):
+        db = self._db()
+        return {
+            "profiles": db.execute("SELECT COUNT(*) FROM profiles").fetchone()[0],
+            "pending": db.execute("SELECT COUNT(*) FROM pending").fetchone()[0],
+            "version": self._meta(db, "version"),
+        }
+
+    @staticmethod
+    def _meta(db, key):
+        row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _set_meta(db, key, value):
+        db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+
+class ProfileRefresher:
+    # Keeps the store in step with the dataset: when its version changes, the triples merge.py appended to
+    # `delta_files` name the entities to rebuild (`affected`); anything else rebuilds every entity (`entities`).
+    # `invalidate(version)` drops whatever caches `build_profile` reads before the rebuild starts
+    def __init__(self, store, build_profile, entities, affected, version_source, delta_files=(),
+                 interval=5.0, batch_size=50, invalidate=None):
+        self.store = store
+        self.build_profile = build_profile
+        self.entities = entities
+        self.affected = affected
+        self.version_source = version_source
+        self.delta_files = list(delta_files)
+        self.invalidate = invalidate
+        self.interval = interval
+        self.batch_size = batch_size
+        self.owner = uuid.uuid4().hex
+        self.refreshed = 0
+        self._wake = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-refresher", daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f" Profile refresh failed: {e}", file=sys.stderr)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def run_once(self):
+        if not self.store.acquire_lease(self.owner, ttl=max(60.0, self.interval * 6)):
+            return 0
+        version = self.version_source()
+        if version and version != self.store.get_meta("version"):
+            self.plan(version)
+        return self.drain()
+
+    def plan(self, version, full=False):
+        if self.invalidate is not None:
+            self.invalidate(version)
+        states = json.loads(self.store.get_meta("delta") or "null")
+        triples, new_state = (None, files_state(self.delta_files)) if full else read_appended(self.delta_files, states)
+        if triples is None:
+            self.store.queue(self.entities(), version, new_state, replace=True)
+        else:
+            self.store.queue(sorted(self.affected(triples)), version, new_state)
+
+    def drain(self):
+        done = 0
+        while True:
+            batch = self.store.claim(self.batch_size)
+            if not batch:
+                return done
+            self.store.put([(uri, generation, self.build_profile(uri)) for uri, generation in batch])
+            done += len(batch)
+            self.refreshed += len(batch)
+            self.store.acquire_lease(self.owner, ttl=max(60.0, self.interval * 6))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute the explorer's entity pages into PROFILE_STORE.")
+    parser.add_argument("--full", action="store_true", help="rebuild every entity, not just those changed")
+    args = parser.parse_args(argv)
+
+    # Configured through the same environment variables as the service
+    import sparql_service
+    refresher = sparql_service.profile_refresher
+    if refresher is None:
+        raise Exception("PROFILE_STORE is disabled")
+    if not refresher.store.acquire_lease(refresher.owner, ttl=300):
+        raise Exception(f"Another process is refreshing '{refresher.store.path}'")
+    start = time.perf_counter()
+    try:
+        if args.full:
+            refresher.plan(sparql_service.dataset_version(), full=True)
+        done = refresher.run_once()
+    finally:
+        refresher.store.release_lease(refresher.owner)
+    stats = refresher.store.stats()
+    print(f" Rebuilt {done} profiles in {time.perf_counter() - start:.1f} s; "
+          f"{stats['profiles']} stored, {stats['pending']} pending")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import asyncio
+import functools
+import hashlib
+import logging
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from query_cache import normalize_query
+
+log = logging.getLogger("sparql_service.slow_queries")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# UNION queries differ with the properties an entity has, so distinct templates are capped
+MAX_TEMPLATES = 500
+
+_IRI_RE = re.compile(r'<[^<>"{}|^`\\\s]*>')
+_STRING_RE = re.compile(r'"""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'')
+_NUMBER_RE = re.compile(r'(?<![\w?$])\d+(?:\.\d+)?\b')
+
+_helper = ContextVar("metrics_helper", default=None)
+_request_timings = ContextVar("metrics_request_timings", default=None)
+
+
+def query_shape(query):
+    # The query with every IRI, string and number replaced, so lookups for different entities match
+    shape = _STRING_RE.sub('"?"', normalize_query(query))
+    shape = _IRI_RE.sub('<?>', shape)
+    return _NUMBER_RE.sub('?', shape)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+class Metrics:
+    def __init__(self, slow_query_ms=None):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self._shapes = {}
+        self._templates = {}
+        self._query_latency = {}
+        self._queries = {}
+        self._rows = {}
+        self._helper_latency = {}
+        self._gauges = []
+
+    def template(self, query):
+        helper = _helper.get() or 'direct'
+        shape = query_shape(query)
+        key = (helper, shape)
+        template = self._shapes.get(key)
+        if template is None:
+            with self._lock:
+                template = self._shapes.get(key)
+                if template is None:
+                    if len(self._templates) >= MAX_TEMPLATES:
+                        return f"{helper}:other"
+                    digest = hashlib.blake2b(shape.encode('utf-8'), digest_size=4).hexdigest()
+                    template = f"{helper}:{digest}"
+                    self._templates[template] = shape
+                    self._shapes[key] = template
+        return template
+
+    def observe_query(self, query, seconds, rows, cached, log_slow=True):
+        template = self.template(query)
+        with self._lock:
+            key = (template, 'hit' if cached else 'miss')
+            self._queries[key] = self._queries.get(key, 0) + 1
+            self._rows[template] = self._rows.get(template, 0) + rows
+            if not cached:
+                self._query_latency.setdefault(template, Histogram()).observe(seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings['sparql'] = timings.get('sparql', 0.0) + (0.0 if cached else seconds)
+            timings['sparql_count'] = timings.get('sparql_count', 0) + 1
+            timings['sparql_cached'] = timings.get('sparql_cached', 0) + (1 if cached else 0)
+        if log_slow and not cached and self.slow_query_ms is not None and seconds * 1000 >= self.slow_query_ms:
+            log.warning("Slow SPARQL query: %.0f ms, %d rows, template %s\n%s", seconds * 1000, rows, template, query)
+
+    def observe_batch(self, entries, seconds):
+        # entries: (query, rows, cached). Batched queries run concurrently, so each is charged the batch's
+        # wall time and a slow batch is logged once
+        executed = 0
+        for query, rows, cached in entries:
+            self.observe_query(query, 0.0 if cached else seconds, rows, cached, log_slow=False)
+            executed += not cached
+        if executed and self.slow_query_ms is not None and seconds * 1000 >= self.slow_query_ms:
+            templates = sorted({self.template(query) for query, _, cached in entries if not cached})
+            log.warning("Slow SPARQL batch: %.0f ms for %d queries, templates %s", seconds * 1000, executed,
+                        ', '.join(templates))
+
+    def observe_helper(self, name, seconds):
+        with self._lock:
+            self._helper_latency.setdefault(name, Histogram()).observe(seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            helpers = timings.setdefault('helpers', {})
+            helpers[name] = helpers.get(name, 0.0) + seconds
+
+    def gauge(self, name, help_text, value_fn):
+        self._gauges.append((name, help_text, value_fn))
+
+    def timed(self, fn):
+        # Records the helper's latency; queries it runs are labelled with its name
+        name = fn.__name__
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                token = _helper.set(name)
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.observe_helper(name, time.perf_counter() - start)
+                    _helper.reset(token)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            token = _helper.set(name)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.observe_helper(name, time.perf_counter() - start)
+                _helper.reset(token)
+        return wrapper
+
+    def start_request(self):
+        timings = {'start': time.perf_counter()}
+        _request_timings.set(timings)
+        return timings
+
+    def server_timing(self, timings):
+        # Server-Timing header value: total, SPARQL time (with query and cache-hit counts), then each helper
+        entries = [f"total;dur={(time.perf_counter() - timings['start']) * 1000:.1f}"]
+        if 'sparql_count' in timings:
+            entries.append(f'sparql;dur={timings["sparql"] * 1000:.1f};'
+                           f'desc="{timings["sparql_count"]} queries, {timings["sparql_cached"]} cached"')
+        for name, seconds in timings.get('helpers', {}).items():
+            entries.append(f"{name};dur={seconds * 1000:.1f}")
+        return ', '.join(entries)
+
+    def render(self):
+        with self._lock:
+            lines = []
+            self._render_histograms(lines, 'sparql_query_duration_seconds',
+                                    'Latency of SPARQL queries sent to the backend, by query template',
+                                    'template', self._query_latency)
+            lines += ['# HELP sparql_queries_total SPARQL lookups by query template and cache status',
+                      '# TYPE sparql_queries_total counter']
+            for (template, cache), count in sorted(self._queries.items()):
+                lines.append(f"sparql_queries_total{_labels(template=template, cache=cache)} {count}")
+            lines += ['# HELP sparql_query_rows_total Result rows returned, by query template',
+                      '# TYPE sparql_query_rows_total counter']
+            for template, rows in sorted(self._rows.items()):
+                lines.append(f"sparql_query_rows_total{_labels(template=template)} {rows}")
+            lines += ['# HELP sparql_query_template_info Normalized query text of each template',
+                      '# TYPE sparql_query_template_info gauge']
+            for template, shape in sorted(self._templates.items()):
+                lines.append(f"sparql_query_template_info{_labels(template=template, query=shape)} 1")
+            self._render_histograms(lines, 'explorer_helper_duration_seconds',
+                                    'Latency of the service helpers, including their queries',
+                                    'helper', self._helper_latency)
+        for name, help_text, value_fn in self._gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value_fn()}"]
+        return '\n'.join(lines) + '\n'
+
+    def _render_histograms(self, lines, name, help_text, label, histograms):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for key, hist in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(**{label: key, 'le': bound})} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(**{label: key, 'le': '+Inf'})} {hist.count}")
+            lines.append(f"{name}_sum{_labels(**{label: key})} {hist.sum}")
+            lines.append(f"{name}_count{_labels(**{label: key})} {hist.count}")
@@ -1,10 +1,21 @@
 import spacy
 from collections import defaultdict
-from dateutil.parser import parse as date_parse
-from dateutil.parser import ParserError
 
-# Load SpaCy English model
-nlp = spacy.load("en_core_web_sm")
+from dates import normalize_date
+from keywords import SentenceFeatures, classify
+from rdf_writer import RDFWriter, turtle_block
+from registry import IndividualRegistry, individual_name
+
+# SpaCy English model, loaded on first use. The lemmatizer is never read by the extraction rules.
+MODEL_NAME = "en_core_web_sm"
+UNUSED_COMPONENTS = ["lemmatizer"]
+_pipelines = {}
+
+def get_nlp(model=MODEL_NAME, exclude=UNUSED_COMPONENTS):
+    key = (model, tuple(exclude))
+    if key not in _pipelines:
+        _pipelines[key] = spacy.load(model, exclude=exclude)
+    return _pipelines[key]
 
 # Ontology schema
 ontology_schema = {
@@ -62,7 +73,7 @@ ontology_schema = {
         "object_properties": ["hasHistoricalPeriod"]
     },
     "Date": {
-        "data_properties": ["hasExactDate", "hasLabelDate"]
+        "data_properties": ["hasExactDate", "hasLabelDate", "hasStartDate", "hasEndDate"]
     },
     "HistoricEvent": {
         "data_properties": ["hasName", "hasStartDate", "hasEventDuration"],
@@ -70,149 +81,55 @@ ontology_schema = {
     }
 }
 
-created_individuals = {}
+# Individuals created so far, so repeated and near-identical mentions share one IRI
+registry = IndividualRegistry()
 
 def create_individual(name, ont_class):
-    indiv_name = name.replace(" ", "").replace("_", "").replace(",", "").replace(".", "")
-    created_individuals[indiv_name] = ont_class
-    return indiv_name
-
-
-def enrich_data_with_keywords(context_text, class_type):
-    data = {}
-    text = context_text.lower()
-
-    # Religion
-    if class_type in ["OrthodoxChurch", "CatholicChurch", "Mosque", "Monastery", "PilgrimageSite"]:
-        if "orthodox" in text:
-            data["hasReligion"] = "Orthodox Christianity"
-        elif "catholic" in text:
-            data["hasReligion"] = "Catholicism"
-        elif "islamic" in text or "muslim" in text:
-            data["hasReligion"] = "Islam"
+    return registry.resolve(name, ont_class)
 
-    # Architectural style
-    if "byzantine" in text:
-        data["hasArchitecturalStyle"] = "Byzantine"
-    elif "islamic architecture" in text or "ottoman" in text:
-        data["hasArchitecturalStyle"] = "Islamic"
-    elif "roman" in text:
-        data["hasArchitecturalStyle"] = "Roman"
+def object_name(name):
+    return registry.object_name(name)
 
-    # Creator
-    if "commissioned by" in text:
-        try:
-            after = text.split("commissioned by", 1)[1]
-            creator = after.split(".")[0].strip()
-            data["hasCreator"] = creator.title()
-        except:
-            pass
-    elif "built by" in text:
-        try:
-            after = text.split("built by", 1)[1]
-            creator = after.split(".")[0].strip()
-            data["hasCreator"] = creator.title()
-        except:
-            pass
 
-    # Cultural context
-    if "medieval" in text:
-        data["hasCulturalContext"] = "Medieval Period"
-    elif "byzantine era" in text or "byzantine rule" in text:
-        data["hasCulturalContext"] = "Byzantine Period"
-    elif "roman" in text:
-        data["hasCulturalContext"] = "Roman Period"
-    elif "ottoman" in text:
-        data["hasCulturalContext"] = "Ottoman Period"
-
-    # Cultural significance
-    if "symbol" in text or "represents" in text or "important" in text:
-        data["hasCulturalSignificance"] = "Important cultural monument"
-
-    # Heritage status
-    if "unesco" in text:
-        data["hasCulturalHeritageStatus"] = "UNESCO World Heritage Site"
-    elif "national heritage" in text:
-        data["hasCulturalHeritageStatus"] = "National Heritage"
-
-    # Date of discovery
-    if "rediscovered" in text:
-        try:
-            parts = text.split("rediscovered")[1]
-            if "in" in parts:
-                year = parts.split("in")[1].split()[0]
-                if year.isdigit():
-                    data["hasDateOfDiscovery"] = year
-        except:
-            pass
-
-    return data
+def enrich_data_with_keywords(context_text, class_type):
+    return dict(SentenceFeatures(context_text).enrich(class_type))
 
 def classify_entity_by_keywords(ent_text, ent_label=None):
-    text = ent_text.lower()
-    if "orthodox" in text and "church" in text:
-        return "OrthodoxChurch"
-    elif "catholic" in text and "church" in text:
-        return "CatholicChurch"
-    elif "mosque" in text:
-        return "Mosque"
-    elif "monastery" in text:
-        return "Monastery"
-    elif "pilgrimage" in text or "shrine" in text:
-        return "PilgrimageSite"
-    elif "castle" in text or "fortress" in text:
-        return "CastleOrFortress"
-    elif "tomb" in text or "burial" in text:
-        return "TombOrBurialMound"
-    elif "rock art" in text or "inscription" in text:
-        return "RockArtOrInscription"
-    elif "ancient city" in text or "ruins" in text or "city" in text:
-        return "AncientCity"
-    elif ent_label == "GPE":
-        return "Region" if "region" in text else "City"
-    elif "war" in text or "battle" in text or "uprising" in text or "awakening" in text:
-        return "HistoricEvent"
-    return None
+    return classify(ent_text, ent_label)
 
 def format_turtle_block(subject, class_type, data, obj_data):
-    lines = [f":{subject} rdf:type :{class_type} ;"]
-    props = []
+    return turtle_block(subject, class_type, data, obj_data, ontology_schema, object_name)
 
-    for prop in ontology_schema.get(class_type, {}).get("data_properties", []):
-        val = data.get(prop)
-        if val:
-            props.append(f'    :{prop} "{val}"')
-
-    for prop in ontology_schema.get(class_type, {}).get("object_properties", []):
-        val = obj_data.get(prop)
-        if val:
-            obj_indiv = val.replace(" ", "").replace("_", "").replace(",", "").replace(".", "")
-            props.append(f'    :{prop} :{obj_indiv}')
+def process_text(text):
+    return process_doc(get_nlp()(text))
 
-    return f"{lines[0]}\n" + " ;\n".join(props) + " ."
+def process_doc(doc):
+    return resolve_mentions(extract_mentions(doc))
 
-def process_text(text):
-    doc = nlp(text)
-    triples = []
+def extract_mentions(doc):
+    # (mention, class, data properties, object links) for each entity in the document; names are resolved
+    # to individuals separately, so documents can be parsed in other processes. Noun chunks carry the
+    # links found in their sentence, other entities None
+    mentions = []
     seen = set()
-    obj_links = defaultdict(dict)
 
     for sent in doc.sents:
-        sent_text = sent.text.strip()
+        features = None
         for chunk in sent.noun_chunks:
             ent_text = chunk.text.strip()
             class_type = classify_entity_by_keywords(ent_text)
             if class_type:
-                indiv = create_individual(ent_text, class_type)
                 data = {"hasName": ent_text}
-                enriched = enrich_data_with_keywords(sent_text, class_type)
-                data.update(enriched)
+                if features is None:
+                    features = SentenceFeatures(sent.text.strip())
+                data.update(features.enrich(class_type))
+                links = {}
                 for ent in sent.ents:
                     if ent.label_ == "GPE":
-                        obj_links[indiv]["locatedIn"] = ent.text
+                        links["locatedIn"] = ent.text
                     elif ent.label_ == "EVENT":
-                        obj_links[indiv]["associatedWithEvent"] = ent.text
-                triples.append((indiv, class_type, data, obj_links[indiv]))
+                        links["associatedWithEvent"] = ent.text
+                mentions.append((ent_text, class_type, data, links))
                 seen.add(ent_text)
 
     for ent in doc.ents:
@@ -221,26 +138,32 @@ def process_text(text):
             continue
         if ent.label_ == "GPE":
             loc_class = "Region" if "region" in ent.text.lower() else "City"
-            indiv = create_individual(ent.text.strip(), loc_class)
-            triples.append((indiv, loc_class, {
+            mentions.append((ent.text.strip(), loc_class, {
                 "hasName": ent.text.strip(),
                 "hasLocationType": loc_class
-            }, {}))
+            }, None))
         elif ent.label_ == "DATE":
-            date_data = {"hasLabelDate": ent.text}
-            try:
-                parsed = date_parse(ent.text, fuzzy=False)
-                iso_date = parsed.date().isoformat()
-                date_data["hasExactDate"] = iso_date
-            except (ParserError, ValueError):
-                pass
-            indiv = create_individual(ent.text, "Date")
-            triples.append((indiv, "Date", date_data, {}))
+            mentions.append((ent.text, "Date", normalize_date(ent.text), None))
         elif ent.label_ == "EVENT":
-            indiv = create_individual(ent_text, "HistoricEvent")
-            triples.append((indiv, "HistoricEvent", {"hasName": ent_text}, {}))
+            mentions.append((ent_text, "HistoricEvent", {"hasName": ent_text}, None))
+
+    return mentions
+
+def resolve_mentions(mentions):
+    triples = []
+    obj_links = defaultdict(dict)
+
+    for name, class_type, data, links in mentions:
+        indiv = create_individual(name, class_type)
+        if links is None:
+            triples.append((indiv, class_type, data, {}))
+        else:
+            # Every mention of an individual in the document shares its links
+            obj_links[indiv].update(links)
+            triples.append((indiv, class_type, data, obj_links[indiv]))
 
-    return triples
+    # An entity mentioned again with the same details adds nothing to the output
+    return [t for t in triples if registry.is_new(*t)]
 
 # ==== MAIN ====
 if __name__ == "__main__":
@@ -268,11 +191,7 @@ It was rediscovered by Italian archaeologist Luigi Maria Ugolini in the 1920s an
 
     entities = process_text(input_text)
 
-    with open("heritage_output.ttl", "w", encoding="utf-8") as f:
-        f.write("@prefix : <http://www.semanticweb.org/ana/ontologies/2025/4/albania/>  .\n")
-        f.write("@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .\n\n")
-        for subj, cls, data, obj_data in entities:
-            turtle_block = format_turtle_block(subj, cls, data, obj_data)
-            f.write(turtle_block + "\n\n")
+    with RDFWriter("heritage_output.ttl", ontology_schema, object_name) as writer:
+        writer.write_all(entities)
 
     print(" RDF triples saved in Turtle format to 'heritage_output.ttl'")
@@ -0,0 +1,168 @@
+import functools
+import re
+from collections import namedtuple
+from datetime import datetime
+
+from dateutil.parser import ParserError
+from dateutil.parser import parse as date_parse
+
+# Distinct date strings kept; a corpus repeats the same few hundred ("the 18th century") endlessly
+DATE_CACHE_SIZE = 4096
+
+# An interval of years, BC as negative numbers (there is no year 0). kind is year, decade, century or
+# millennium; era is -1 for BC, 1 for AD, None when the text does not say
+Span = namedtuple("Span", "start end kind era")
+
+_ORDINALS = ["first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth", "tenth",
+             "eleventh", "twelfth", "thirteenth", "fourteenth", "fifteenth", "sixteenth", "seventeenth",
+             "eighteenth", "nineteenth", "twentieth", "twenty-first"]
+_SUFFIXES = {1: "st", 2: "nd", 3: "rd"}
+_ORDINAL_WORD_RE = re.compile(r"\b(" + "|".join(sorted(_ORDINALS, key=len, reverse=True)) +
+                              r")(?=[\s-]+(?:century|centuries|millennium|millennia)\b)")
+_LEADING_RE = re.compile(r"^(?:(?:in|during|since|by|from about|the|circa|ca\.|c\.|around|about|approximately|"
+                         r"approx\.|sometime in)\s+)+")
+
+_BC = r"b\.?\s?c\.?(?:e\.?)?"
+_AD = r"a\.?\s?d\.?|c\.?e\.?"
+_ERA = rf"(?:\s*(?:(?P<bc>{_BC})|(?P<ad>{_AD})))?"
+_QUALIFIER = (r"(?:(?P<q>early|mid|middle|late|first half of|second half of|first quarter of|last quarter of)"
+              r"[\s-]+(?:the\s+)?)?")
+_CENTURY_RE = re.compile(rf"^{_QUALIFIER}(?P<n>\d{{1,2}})(?:st|nd|rd|th)?[\s-]*"
+                         rf"(?P<unit>centuries|century|cent\.|c\.|millennium|millennia){_ERA}$")
+_DECADE_RE = re.compile(rf"^{_QUALIFIER}(?P<d>\d{{1,3}}0)'?s{_ERA}$")
+_YEAR_RE = re.compile(rf"^(?:(?P<pre_bc>{_BC})|(?P<pre_ad>{_AD}))?\s*(?P<y>\d{{1,4}}){_ERA}$")
+_RANGE_START_RE = re.compile(r"^(?:from|between)\s+")
+_RANGE_SEP_RE = re.compile(r"\s*(?:-|/|\bto\b|\band\b|\buntil\b|\btill\b)\s*")
+
+# Parts of a period the qualifiers pick out, as fractions of its length
+_QUALIFIERS = {"early": (0, 1 / 3), "mid": (1 / 3, 2 / 3), "middle": (1 / 3, 2 / 3), "late": (2 / 3, 1),
+               "first half of": (0, 1 / 2), "second half of": (1 / 2, 1),
+               "first quarter of": (0, 1 / 4), "last quarter of": (3 / 4, 1)}
+
+
+def _ordinal(word):
+    n = _ORDINALS.index(word) + 1
+    return f"{n}{'th' if 10 <= n % 100 <= 20 else _SUFFIXES.get(n % 10, 'th')}"
+
+
+def date_key(text):
+    key = " ".join(text.casefold().replace("–", "-").replace("—", "-").split())
+    key = _ORDINAL_WORD_RE.sub(lambda m: _ordinal(m.group(1)), key)
+    return _LEADING_RE.sub("", key).strip(" ,;")
+
+
+def format_year(year):
+    return f"{-year} BC" if year < 0 else str(year)
+
+
+def _era(m, *groups):
+    for group, era in zip(groups, (-1, 1, -1, 1)):
+        if m.groupdict().get(group):
+            return era
+    return None
+
+
+def _qualify(start, end, qualifier):
+    if not qualifier:
+        return start, end
+    lo, hi = _QUALIFIERS[qualifier]
+    length = end - start + 1
+    return start + round(length * lo), start + round(length * hi) - 1
+
+
+def parse_point(key):
+    # One year, decade, century or millennium as a Span, or None
+    m = _CENTURY_RE.match(key)
+    if m:
+        n, era = int(m.group("n")), _era(m, "bc", "ad")
+        size, kind = (1000, "millennium") if m.group("unit").startswith("millenni") else (100, "century")
+        if n == 0:
+            return None
+        if era == -1:
+            start, end = -n * size, -(n - 1) * size - 1
+        else:
+            start, end = (n - 1) * size + 1, n * size
+        return Span(*_qualify(start, end, m.group("q")), kind, era)
+    m = _DECADE_RE.match(key)
+    if m:
+        d, era = int(m.group("d")), _era(m, "bc", "ad")
+        # "the 1400s" is a century, "the 1920s" a decade
+        span = 100 if d % 100 == 0 and d >= 100 else 10
+        start, end = (-(d + span - 1), -d) if era == -1 else (d, d + span - 1)
+        return Span(*_qualify(start, end, m.group("q")), "decade", era)
+    m = _YEAR_RE.match(key)
+    if m:
+        y, era = int(m.group("y")), _era(m, "pre_bc", "pre_ad", "bc", "ad")
+        if y == 0:
+            return None
+        y = -y if era == -1 else y
+        return Span(y, y, "year", era)
+    return None
+
+
+def parse_range(key):
+    # "1443-1468", "1443-68", "1000-800 BC", "12th-13th centuries", "from 1385 to 1417",
+    # "the 3rd century BC to the 2nd century AD"
+    key = _RANGE_START_RE.sub("", key)
+    for m in _RANGE_SEP_RE.finditer(key):
+        left, right = _LEADING_RE.sub("", key[:m.start()]), _LEADING_RE.sub("", key[m.end():])
+        if not left or not right:
+            continue
+        b = parse_point(right)
+        if b is None:
+            continue
+        # The start takes the end's unit ("12th-13th centuries") and era ("1000-800 BC") unless it has its own
+        unit = {"century": " century", "millennium": " millennium"}.get(b.kind)
+        a = None
+        for candidate in (f"{left}{unit}", left) if unit else (left,):
+            a = parse_point(candidate)
+            if a is not None:
+                if a.era is None and b.era == -1:
+                    a = parse_point(f"{candidate} bc")
+                break
+        if a is None:
+            continue
+        if a.kind == b.kind == "year" and b.era is None and a.start > 0 and len(right) < len(left):
+            # "1443-68": the end year shares the start year's leading digits
+            y = int(left[:len(left) - len(right)] + right)
+            b = Span(y, y, "year", None)
+        return Span(min(a.start, b.start), max(a.end, b.end), "range", b.era)
+    return None
+
+
+def _exact_date(text):
+    # dateutil fills in missing parts from `default`; parsing with two defaults shows which were given
+    try:
+        first = date_parse(text, default=datetime(1, 1, 1))
+        second = date_parse(text, default=datetime(2, 2, 2))
+    except (ParserError, ValueError, OverflowError):
+        return None
+    if first.year != second.year:
+        return None
+    if first.month != second.month or first.day != second.day:
+        return Span(first.year, first.year, "year", None), None
+    return Span(first.year, first.year, "year", None), first.date().isoformat()
+
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def _normalize(key):
+    span = parse_point(key) or parse_range(key)
+    exact = None
+    if span is None:
+        parsed = _exact_date(key)
+        if parsed is None:
+            return ()
+        span, exact = parsed
+    values = [("hasStartDate", format_year(span.start)), ("hasEndDate", format_year(span.end))]
+    if exact:
+        values.append(("hasExactDate", exact))
+    return tuple(values)
+
+
+def normalize_date(text):
+    # Data properties of a Date individual for a DATE entity's text
+    return {"hasLabelDate": text, **dict(_normalize(date_key(text)))}
+
+
+def cache_info():
+    return _normalize.cache_info()
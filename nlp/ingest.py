@@ -0,0 +1,118 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from NLP import MODEL_NAME, UNUSED_COMPONENTS, get_nlp, object_name, ontology_schema, process_doc, registry
+from rdf_writer import RDFWriter
+
+
+def read_documents(path, text_field="text"):
+    for _, text in enumerate_documents(path, text_field):
+        yield text
+
+
+def enumerate_documents(path, text_field="text", shard=0, shards=1):
+    # (index, text) of a directory of .txt files (one document each), a JSONL file, or a single text file.
+    # Only every `shards`-th document from `shard` on is read and decoded; the others are just counted
+    i = 0
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(".txt"):
+                    if i % shards == shard:
+                        with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+                            yield i, f.read()
+                    i += 1
+    elif path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    if i % shards == shard:
+                        yield i, json.loads(line)[text_field]
+                    i += 1
+    elif shard == 0:
+        with open(path, "r", encoding="utf-8") as f:
+            yield 0, f.read()
+
+
+class Throughput:
+    def __init__(self, report_every=0, stream=sys.stderr):
+        self.docs = 0
+        self.report_every = report_every
+        self.stream = stream
+        self.start = None
+
+    def count(self, docs):
+        # Timing starts with the first document, after the model has been loaded
+        self.start = time.perf_counter()
+        for doc in docs:
+            self.docs += 1
+            if self.report_every and self.docs % self.report_every == 0:
+                self.report()
+            yield doc
+
+    @property
+    def docs_per_sec(self):
+        if self.start is None:
+            return 0.0
+        elapsed = time.perf_counter() - self.start
+        return self.docs / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        print(f" {self.docs} documents, {self.docs_per_sec:.1f} docs/sec", file=self.stream)
+
+
+def iter_entities(texts, batch_size=64, n_process=1, model=MODEL_NAME, exclude=UNUSED_COMPONENTS, throughput=None):
+    nlp = get_nlp(model, exclude)
+    docs = nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+    if throughput is not None:
+        docs = throughput.count(docs)
+    # Individuals are resolved in this process as documents come back, so the registry stays consistent
+    for doc in docs:
+        yield from process_doc(doc)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract ontology individuals from a corpus of heritage descriptions.")
+    parser.add_argument("input", help="directory of .txt files, a .jsonl file or a single text file")
+    parser.add_argument("-o", "--output", default="heritage_output.ttl",
+                        help="output file; a .gz suffix compresses it")
+    parser.add_argument("--format", choices=["ttl", "nt"],
+                        help="Turtle or N-Triples (default: from the output extension)")
+    parser.add_argument("--text-field", default="text", help="JSONL field holding the document text")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-process", type=int, default=1)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--exclude", default=",".join(UNUSED_COMPONENTS),
+                        help="comma-separated pipeline components to leave out")
+    parser.add_argument("--report-every", type=int, default=1000, help="print throughput every N documents")
+    parser.add_argument("--ontology", default="cultural_heritage_ontology.ttl",
+                        help="link mentions to the individuals of this ontology when it exists ('' to skip)")
+    parser.add_argument("--fuzzy-threshold", type=float, default=registry.threshold,
+                        help="trigram similarity above which a mention joins an individual of the same class")
+    args = parser.parse_args(argv)
+
+    registry.threshold = args.fuzzy_threshold
+    if args.ontology and os.path.exists(args.ontology):
+        linked = registry.link_ontology(args.ontology)
+        print(f" Linking mentions to {linked} individuals of '{args.ontology}'")
+
+    exclude = [name for name in args.exclude.split(",") if name]
+    throughput = Throughput(args.report_every)
+    entities = iter_entities(read_documents(args.input, args.text_field), args.batch_size, args.n_process,
+                             args.model, exclude, throughput)
+
+    with RDFWriter(args.output, ontology_schema, object_name, args.format) as writer:
+        writer.write_all(entities)
+
+    throughput.report()
+    kind = "N-Triples" if writer.fmt == "nt" else "Turtle"
+    print(f" {writer.count} entities saved in {kind} format to '{args.output}'")
+    print(f" {len(registry)} individuals; {registry.exact_hits} repeated and {registry.fuzzy_hits} near-identical mentions resolved")
+
+
+if __name__ == "__main__":
+    main()
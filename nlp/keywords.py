@@ -0,0 +1,161 @@
+import functools
+
+RELIGIOUS_CLASSES = ["OrthodoxChurch", "CatholicChurch", "Mosque", "Monastery", "PilgrimageSite"]
+
+# (class, required entity label or None, alternatives); an alternative matches when all its keywords occur.
+# Rules are tried in order and the first match wins.
+CLASS_RULES = [
+    ("OrthodoxChurch", None, [("orthodox", "church")]),
+    ("CatholicChurch", None, [("catholic", "church")]),
+    ("Mosque", None, [("mosque",)]),
+    ("Monastery", None, [("monastery",)]),
+    ("PilgrimageSite", None, [("pilgrimage",), ("shrine",)]),
+    ("CastleOrFortress", None, [("castle",), ("fortress",)]),
+    ("TombOrBurialMound", None, [("tomb",), ("burial",)]),
+    ("RockArtOrInscription", None, [("rock art",), ("inscription",)]),
+    ("AncientCity", None, [("ancient city",), ("ruins",), ("city",)]),
+    ("Region", "GPE", [("region",)]),
+    ("City", "GPE", [()]),
+    ("HistoricEvent", None, [("war",), ("battle",), ("uprising",), ("awakening",)]),
+]
+
+
+def _text_after(keyword):
+    def extract(text):
+        after = text.split(keyword, 1)[1]
+        return after.split(".")[0].strip().title()
+    return extract
+
+
+def _discovery_year(text):
+    try:
+        parts = text.split("rediscovered")[1]
+        if "in" in parts:
+            year = parts.split("in")[1].split()[0]
+            if year.isdigit():
+                return year
+    except IndexError:
+        pass
+    return None
+
+
+# (property, classes the rule applies to or None, [(any of these keywords, value or extractor)]).
+# Within a property the first matching entry wins; an extractor returning None leaves the property unset.
+ENRICHMENT_RULES = [
+    ("hasReligion", RELIGIOUS_CLASSES, [
+        (("orthodox",), "Orthodox Christianity"),
+        (("catholic",), "Catholicism"),
+        (("islamic", "muslim"), "Islam"),
+    ]),
+    ("hasArchitecturalStyle", None, [
+        (("byzantine",), "Byzantine"),
+        (("islamic architecture", "ottoman"), "Islamic"),
+        (("roman",), "Roman"),
+    ]),
+    ("hasCreator", None, [
+        (("commissioned by",), _text_after("commissioned by")),
+        (("built by",), _text_after("built by")),
+    ]),
+    ("hasCulturalContext", None, [
+        (("medieval",), "Medieval Period"),
+        (("byzantine era", "byzantine rule"), "Byzantine Period"),
+        (("roman",), "Roman Period"),
+        (("ottoman",), "Ottoman Period"),
+    ]),
+    ("hasCulturalSignificance", None, [
+        (("symbol", "represents", "important"), "Important cultural monument"),
+    ]),
+    ("hasCulturalHeritageStatus", None, [
+        (("unesco",), "UNESCO World Heritage Site"),
+        (("national heritage",), "National Heritage"),
+    ]),
+    ("hasDateOfDiscovery", None, [
+        (("rediscovered",), _discovery_year),
+    ]),
+]
+
+
+# Every class keyword gets one bit; the keywords found in a text are kept as a bit set, and an alternative
+# matches when all of its bits are set
+_CLASS_BITS = tuple((keyword, 1 << i) for i, keyword in enumerate(
+    sorted({k for _, _, alternatives in CLASS_RULES for keywords in alternatives for k in keywords})))
+_BITS = dict(_CLASS_BITS)
+_CLASS_TESTS = [(class_type, required_label, [sum(_BITS[k] for k in keywords) for keywords in alternatives])
+                for class_type, required_label, alternatives in CLASS_RULES]
+
+
+def _class_mask(text):
+    mask = 0
+    for keyword, bit in _CLASS_BITS:
+        if keyword in text:
+            mask |= bit
+    return mask
+
+
+# Texts share few keyword combinations, so the rules are walked once per combination
+@functools.lru_cache(maxsize=4096)
+def _class_for(mask, ent_label):
+    for class_type, required_label, alternatives in _CLASS_TESTS:
+        if required_label is not None and ent_label != required_label:
+            continue
+        for bits in alternatives:
+            if mask & bits == bits:
+                return class_type
+    return None
+
+
+# Noun chunks repeat across a corpus ("the castle", "the old mosque"), so classes are remembered per text
+@functools.lru_cache(maxsize=16384)
+def classify(ent_text, ent_label=None):
+    return _class_for(_class_mask(ent_text.lower()), ent_label)
+
+
+_enrichment_keys = {}
+
+
+def _enrichment_key(class_type):
+    # Classes that unlock the same rules (e.g. all religious buildings) share one result
+    key = _enrichment_keys.get(class_type)
+    if key is None:
+        key = tuple(classes is None or class_type in classes for _, classes, _ in ENRICHMENT_RULES)
+        _enrichment_keys[class_type] = key
+    return key
+
+
+@functools.lru_cache(maxsize=None)
+def _enrichment_plan(key):
+    # The rules a class unlocks, with each entry's keywords flattened in order: (property, ((keyword, value), ...))
+    return tuple((prop, tuple((k, value) for keywords, value in entries for k in keywords))
+                 for (prop, _, entries), applies in zip(ENRICHMENT_RULES, key) if applies)
+
+
+def enrich(text, class_type):
+    # `text` is already lowercased
+    data = {}
+    for prop, entries in _enrichment_plan(_enrichment_key(class_type)):
+        for keyword, value in entries:
+            if keyword in text:
+                if callable(value):
+                    value = value(text)
+                if value is not None:
+                    data[prop] = value
+                break
+    return data
+
+
+class SentenceFeatures:
+    # Enrichment reads the whole sentence, so it is computed once per group of classes and shared by all
+    # noun chunks of the sentence
+    def __init__(self, text):
+        self.text = text
+        self._lower = None
+        self._enriched = {}
+
+    def enrich(self, class_type):
+        key = _enrichment_key(class_type)
+        data = self._enriched.get(key)
+        if data is None:
+            if self._lower is None:
+                self._lower = self.text.lower()
+            data = self._enriched[key] = enrich(self._lower, class_type)
+        return data
@@ -1,5 +1,231 @@
-with open("final_merged_output.ttl", "w", encoding="utf-8") as final:
-    with open("cultural_heritage_ontology.ttl", "r", encoding="utf-8") as onto:
-        final.write(onto.read() + "\n")
-    with open("heritage_output.ttl", "r", encoding="utf-8") as indivs:
-        final.write(indivs.read())
+import argparse
+import gzip
+import hashlib
+import os
+import re
+import sqlite3
+import unicodedata
+
+import requests
+from rdflib import Graph, URIRef
+from rdflib.namespace import OWL, RDF
+from rdflib.util import guess_format
+
+ONTOLOGY_FILE = "cultural_heritage_ontology.ttl"
+NLP_OUTPUT_FILE = "heritage_output.ttl"
+MERGED_FILE = "final_merged_output.ttl"
+
+_LITERAL_RE = re.compile(r'("(?:[^"\\\n]|\\.)*")')
+# Bumped when individual_key changes, so the keys stored in an existing manifest are recomputed
+INDIVIDUAL_KEY_VERSION = "2"
+
+
+def triple_line(s, p, o):
+    return f"{s.n3()} {p.n3()} {o.n3()} ."
+
+
+def triple_hash(line):
+    return hashlib.blake2b(line.encode("utf-8"), digest_size=16).digest()
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def individual_key(iri):
+    # create_individual only strips spaces and punctuation, so "TheCastle", "The_Castle" and
+    # "Thecastle" are the same mention; compare local names case- and accent-insensitively, within
+    # one namespace
+    iri = str(iri)
+    local = re.split(r"[/#]", iri)[-1]
+    namespace = iri[:len(iri) - len(local)]
+    local = unicodedata.normalize("NFKD", local)
+    return namespace + "".join(c for c in local.casefold() if c.isalnum() and not unicodedata.combining(c))
+
+
+def _escape_local_names(text):
+    # NLP output written before escaping was added can hold quotes in prefixed names (:The_Et'hem_Bey_Mosque)
+    lines = []
+    for line in text.splitlines():
+        parts = _LITERAL_RE.split(line)
+        for i in range(0, len(parts), 2):
+            parts[i] = parts[i].replace("'", "\\'")
+        lines.append("".join(parts))
+    return "\n".join(lines)
+
+
+def _read_text(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def parse_rdf(path):
+    graph = Graph()
+    fmt = guess_format(path[:-3] if path.endswith(".gz") else path) or "turtle"
+    text = _read_text(path)
+    try:
+        graph.parse(data=text, format=fmt)
+    except Exception:
+        if fmt != "turtle":
+            raise
+        graph = Graph()
+        graph.parse(data=_escape_local_names(text), format="turtle")
+        print(f" Warning: '{path}' is not valid Turtle, parsed it after escaping quotes in names")
+    return graph
+
+
+class Manifest:
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS triples (hash BLOB PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS individuals (key TEXT PRIMARY KEY, iri TEXT NOT NULL) WITHOUT ROWID;
+        """)
+
+    def get(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def reset(self):
+        self.db.executescript("DELETE FROM meta; DELETE FROM triples; DELETE FROM individuals;")
+
+    def add_triple(self, line):
+        # True when the triple has not been merged before
+        return self.db.execute("INSERT OR IGNORE INTO triples VALUES (?)", (triple_hash(line),)).rowcount == 1
+
+    def individual(self, key):
+        row = self.db.execute("SELECT iri FROM individuals WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def add_individual(self, key, iri):
+        self.db.execute("INSERT OR IGNORE INTO individuals VALUES (?, ?)", (key, iri))
+
+    def rekey(self, key):
+        iris = [iri for iri, in self.db.execute("SELECT iri FROM individuals ORDER BY iri")]
+        self.db.execute("DELETE FROM individuals")
+        self.db.executemany("INSERT OR IGNORE INTO individuals VALUES (?, ?)", ((key(iri), iri) for iri in iris))
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+def rebuild(ontology, merged, manifest):
+    manifest.reset()
+    graph = parse_rdf(ontology)
+    for triple in graph:
+        manifest.add_triple(triple_line(*triple))
+    for individual in sorted(set(graph.subjects(RDF.type, OWL.NamedIndividual))):
+        if isinstance(individual, URIRef):
+            manifest.add_individual(individual_key(individual), str(individual))
+    with open(merged, "w", encoding="utf-8") as final:
+        with open(ontology, "r", encoding="utf-8") as onto:
+            final.write(onto.read() + "\n")
+    manifest.set("ontology", file_digest(ontology))
+    manifest.set("individual_keys", INDIVIDUAL_KEY_VERSION)
+
+
+def resolve_individuals(graph, manifest):
+    mapping = {}
+    # In IRI order, so spellings of one individual always resolve to the same IRI (the smallest new one)
+    for subject in sorted(set(graph.subjects())):
+        if not isinstance(subject, URIRef):
+            continue
+        key = individual_key(subject)
+        canonical = manifest.individual(key)
+        if canonical is None:
+            manifest.add_individual(key, str(subject))
+        elif canonical != str(subject):
+            mapping[subject] = URIRef(canonical)
+    for p, o in set(graph.predicate_objects()):
+        if p != RDF.type and isinstance(o, URIRef) and o not in mapping:
+            canonical = manifest.individual(individual_key(o))
+            if canonical is not None and canonical != str(o):
+                mapping[o] = URIRef(canonical)
+    for s, p, o in graph:
+        yield mapping.get(s, s), p, (o if p == RDF.type else mapping.get(o, o))
+
+
+def version_path(merged):
+    # Rewritten after every successful push; sparql_service reads the store's dataset version from it
+    return os.path.splitext(merged)[0] + ".version"
+
+
+def merge(ontology=ONTOLOGY_FILE, nlp_output=NLP_OUTPUT_FILE, merged=MERGED_FILE, manifest_path=None, force=False,
+          push=None):
+    manifest = Manifest(manifest_path or os.path.splitext(merged)[0] + ".manifest.sqlite")
+    try:
+        # Start over when the merged file or the base ontology no longer match what the manifest recorded
+        if (force or not os.path.exists(merged)
+                or manifest.get("ontology") != file_digest(ontology)
+                or manifest.get("merged_size") != str(os.path.getsize(merged))):
+            rebuild(ontology, merged, manifest)
+        elif manifest.get("individual_keys") != INDIVIDUAL_KEY_VERSION:
+            manifest.rekey(individual_key)
+            manifest.set("individual_keys", INDIVIDUAL_KEY_VERSION)
+
+        lines = sorted({triple_line(*t) for t in resolve_individuals(parse_rdf(nlp_output), manifest)})
+        delta = [line for line in lines if manifest.add_triple(line)]
+        # The store gets the triples before anything records them as merged: if the push fails the manifest
+        # is rolled back and the next run sends the same delta again (re-inserting a triple is a no-op)
+        if delta and push is not None:
+            push(delta)
+        if delta:
+            with open(merged, "a", encoding="utf-8") as final:
+                final.write("\n".join(delta) + "\n")
+        manifest.set("merged_size", str(os.path.getsize(merged)))
+        manifest.commit()
+    finally:
+        manifest.close()
+    if delta and push is not None:
+        with open(version_path(merged), "w", encoding="utf-8") as f:
+            f.write(f"{os.path.getsize(merged)}\n")
+    return delta
+
+
+def push_delta(lines, update_endpoint=None, data_endpoint=None, batch_size=5000):
+    # Send only the new triples: SPARQL Update INSERT DATA, or a Graph Store Protocol POST
+    for i in range(0, len(lines), batch_size):
+        chunk = "\n".join(lines[i:i + batch_size])
+        if update_endpoint:
+            response = requests.post(update_endpoint, data={"update": f"INSERT DATA {{\n{chunk}\n}}"})
+        else:
+            response = requests.post(data_endpoint, data=chunk.encode("utf-8"),
+                                     headers={"Content-Type": "application/n-triples"})
+        if response.status_code >= 300:
+            raise Exception(f"SPARQL update failed: {response.text}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge NLP individuals into the ontology, appending only new triples.")
+    parser.add_argument("--ontology", default=ONTOLOGY_FILE)
+    parser.add_argument("--input", default=NLP_OUTPUT_FILE)
+    parser.add_argument("--output", default=MERGED_FILE)
+    parser.add_argument("--manifest", help="defaults to <output>.manifest.sqlite")
+    parser.add_argument("--rebuild", action="store_true", help="rewrite the merged file from scratch")
+    parser.add_argument("--update-endpoint", help="SPARQL Update endpoint to INSERT DATA the new triples into")
+    parser.add_argument("--data-endpoint", help="Graph Store Protocol endpoint to POST the new triples to")
+    args = parser.parse_args(argv)
+
+    push = None
+    if args.update_endpoint or args.data_endpoint:
+        push = lambda lines: push_delta(lines, args.update_endpoint, args.data_endpoint)
+    delta = merge(args.ontology, args.input, args.output, args.manifest, args.rebuild, push)
+    print(f" Merged {len(delta)} new triples into '{args.output}'")
+    if delta and push is not None:
+        print(f" Pushed {len(delta)} triples to the SPARQL store")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import gzip
+import re
+from urllib.parse import quote
+
+NAMESPACE = "http://www.semanticweb.org/ana/ontologies/2025/4/albania/"
+RDF_NS = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+
+_STRING_ESCAPES = {"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+_STRING_RE = re.compile(r'[\\"\n\r\t\b\f]')
+
+# Characters Turtle lets a prefixed name carry with a backslash escape
+_LOCAL_ESCAPES = re.compile(r"([~!$&'()*+,;=/?#@%])")
+_PN_CHARS_BASE = ("A-Za-z\u00c0-\u00d6\u00d8-\u00f6\u00f8-\u02ff\u0370-\u037d\u037f-\u1fff\u200c-\u200d"
+                  "\u2070-\u218f\u2c00-\u2fef\u3001-\ud7ff\uf900-\ufdcf\ufdf0-\ufffd")
+_PN_CHARS = _PN_CHARS_BASE + "_0-9\\-\u00b7\u0300-\u036f\u203f-\u2040"
+_LOCAL_NAME_RE = re.compile(f"^(?:[{_PN_CHARS_BASE}_0-9]|\\\\.)(?:[{_PN_CHARS}.]|\\\\.)*(?<!\\.)$")
+_IRI_UNSAFE = ' <>"{}|^`\\'
+
+
+def turtle_string(value):
+    return '"' + _STRING_RE.sub(lambda m: _STRING_ESCAPES[m.group()], str(value)) + '"'
+
+
+def iri(local, namespace=NAMESPACE):
+    unsafe = "".join(c for c in local if c in _IRI_UNSAFE or ord(c) < 0x20)
+    if unsafe:
+        local = "".join(quote(c, safe="") if c in unsafe else c for c in local)
+    return "<" + namespace + local + ">"
+
+
+def prefixed_name(local, namespace=NAMESPACE):
+    # ":Name" when Turtle can spell it (escaping ' and friends), the full IRI otherwise
+    escaped = _LOCAL_ESCAPES.sub(r"\\\1", local)
+    if _LOCAL_NAME_RE.match(escaped):
+        return ":" + escaped
+    return iri(local, namespace)
+
+
+def turtle_block(subject, class_type, data, obj_data, schema, individual_name):
+    lines = [f"{prefixed_name(subject)} rdf:type {prefixed_name(class_type)}"]
+    for prop in schema.get(class_type, {}).get("data_properties", []):
+        val = data.get(prop)
+        if val:
+            lines.append(f"    {prefixed_name(prop)} {turtle_string(val)}")
+    for prop in schema.get(class_type, {}).get("object_properties", []):
+        val = obj_data.get(prop)
+        if val:
+            lines.append(f"    {prefixed_name(prop)} {prefixed_name(individual_name(val))}")
+    return " ;\n".join(lines) + " ."
+
+
+def ntriples(subject, class_type, data, obj_data, schema, individual_name):
+    s = iri(subject)
+    lines = [f"{s} <{RDF_NS}type> {iri(class_type)} ."]
+    for prop in schema.get(class_type, {}).get("data_properties", []):
+        val = data.get(prop)
+        if val:
+            lines.append(f"{s} {iri(prop)} {turtle_string(val)} .")
+    for prop in schema.get(class_type, {}).get("object_properties", []):
+        val = obj_data.get(prop)
+        if val:
+            lines.append(f"{s} {iri(prop)} {iri(individual_name(val))} .")
+    return "\n".join(lines)
+
+
+class RDFWriter:
+    # Writes entities as they come off the pipeline; nothing is kept in memory but the output buffer
+    def __init__(self, path, schema, individual_name, fmt=None, buffer_size=1 << 16):
+        if fmt is None:
+            fmt = "nt" if path.endswith((".nt", ".nt.gz")) else "ttl"
+        if fmt not in ("ttl", "nt"):
+            raise ValueError(f"Unknown RDF output format: {fmt}")
+        self.fmt = fmt
+        self.schema = schema
+        self.individual_name = individual_name
+        self.count = 0
+        if path.endswith(".gz"):
+            self.file = gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+        else:
+            self.file = open(path, "w", encoding="utf-8", buffering=buffer_size)
+        if fmt == "ttl":
+            self.file.write(f"@prefix : <{NAMESPACE}>  .\n")
+            self.file.write(f"@prefix rdf: <{RDF_NS}> .\n\n")
+
+    def write(self, subject, class_type, data, obj_data):
+        if self.fmt == "ttl":
+            self.file.write(turtle_block(subject, class_type, data, obj_data, self.schema, self.individual_name) + "\n\n")
+        else:
+            self.file.write(ntriples(subject, class_type, data, obj_data, self.schema, self.individual_name) + "\n")
+        self.count += 1
+
+    def write_all(self, entities):
+        for subject, class_type, data, obj_data in entities:
+            self.write(subject, class_type, data, obj_data)
+        return self.count
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,214 @@
+import hashlib
+import math
+import re
+import sys
+import unicodedata
+from array import array
+from collections import Counter
+
+from rdflib import Graph, URIRef
+from rdflib.namespace import OWL, RDF, RDFS
+
+from rdf_writer import NAMESPACE
+
+# Words that do not tell two mentions apart: "The Castle of Berat" and "Berat Castle" share a key
+STOPWORDS = {"the", "a", "an", "of", "s"}
+FUZZY_THRESHOLD = 0.7
+# Fuzzy matches are scored against at most this many individuals, those sharing the most of the mention's
+# rarest trigrams; counting stops once MAX_COUNTED individuals have been seen
+MAX_CANDIDATES = 64
+MAX_COUNTED = 4096
+# Edits per character allowed between the words a fuzzy match does not share: "Nicolas" is a misspelling of
+# "Nicholas", "Elbasan Fortress Jqjuhp" and "Elbasan Fortress Jqivhp" are two fortresses
+TOKEN_EDIT_RATIO = 0.2
+# Classes the NLP output uses for individuals the ontology types otherwise
+CLASS_ALIASES = {"Date": "TimePeriod"}
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_CAMEL_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|_+")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def individual_name(name):
+    return name.replace(" ", "").replace("_", "").replace(",", "").replace(".", "")
+
+
+def normalize_name(name):
+    # Case, accents, punctuation, articles and word order are ignored
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(c for c in text.casefold() if not unicodedata.combining(c))
+    return " ".join(sorted(t for t in _TOKEN_RE.findall(text) if t not in STOPWORDS))
+
+
+def trigrams(key):
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def close_words(a, b, ratio=TOKEN_EDIT_RATIO):
+    # The words only one of the keys has, joined, must be a few edits apart
+    ta, tb = Counter(a.split()), Counter(b.split())
+    rest_a, rest_b = "".join(sorted((ta - tb).elements())), "".join(sorted((tb - ta).elements()))
+    return edit_distance(rest_a, rest_b) <= max(1, int(ratio * max(len(rest_a), len(rest_b))))
+
+
+class IndividualRegistry:
+    def __init__(self, threshold=FUZZY_THRESHOLD, max_candidates=MAX_CANDIDATES):
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.clear()
+
+    def clear(self):
+        self._slots = {}             # normalized key (or alias) -> slot
+        self._shadowed = {}          # (key, class index) -> slot, for keys another class took first
+        self._keys = []              # slot -> normalized key
+        self._names = []             # slot -> individual name, interned
+        self._classes = array("H")   # slot -> index into _class_names
+        self._class_names = []
+        self._class_ids = {}
+        self._blocks = {}            # trigram -> array of slots holding it
+        self._emitted = set()        # digests of the entities already written
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+
+    def __len__(self):
+        return len(self._names)
+
+    def _class_id(self, ont_class):
+        ont_class = CLASS_ALIASES.get(ont_class, ont_class)
+        class_id = self._class_ids.get(ont_class)
+        if class_id is None:
+            class_id = self._class_ids[ont_class] = len(self._class_names)
+            self._class_names.append(ont_class)
+        return class_id
+
+    def _lookup(self, key, class_id):
+        slot = self._slots.get(key)
+        if slot is not None and self._classes[slot] != class_id:
+            slot = self._shadowed.get((key, class_id))
+        return slot
+
+    def _remember(self, key, slot):
+        if self._slots.setdefault(key, slot) != slot:
+            self._shadowed.setdefault((key, self._classes[slot]), slot)
+
+    def add(self, name, ont_class, key):
+        slot = len(self._names)
+        self._keys.append(key)
+        self._names.append(sys.intern(name))
+        self._classes.append(self._class_id(ont_class))
+        self._remember(key, slot)
+        for gram in trigrams(key):
+            block = self._blocks.get(gram)
+            if block is None:
+                block = self._blocks[gram] = array("I")
+            block.append(slot)
+        return slot
+
+    def _fuzzy(self, key, class_id):
+        grams = trigrams(key)
+        need = math.ceil(self.threshold * len(grams))
+        # A match shares at least `need` of the mention's trigrams, so it is in one of the
+        # len(grams) - need + 1 smallest blocks; only those are read
+        probe = sorted(grams, key=lambda g: len(self._blocks.get(g, ())))[:len(grams) - need + 1]
+        blocks = [self._blocks.get(gram, ()) for gram in probe]
+        if sum(map(len, blocks)) <= self.max_candidates:
+            candidates = set().union(*blocks)
+        else:
+            counts = Counter()
+            for block in blocks:
+                counts.update(block)
+                if len(counts) > MAX_COUNTED:
+                    break
+            candidates = [slot for slot, _ in counts.most_common(self.max_candidates)]
+        digits = _DIGITS_RE.findall(key)
+        # Keys of very different lengths cannot reach the threshold (trigram count = length + 2, at most)
+        shortest, longest = self.threshold * len(grams) - 2, len(grams) / self.threshold
+        best, best_score = None, self.threshold
+        for slot in sorted(candidates):
+            if self._classes[slot] != class_id:
+                continue
+            other = self._keys[slot]
+            if not shortest <= len(other) <= longest:
+                continue
+            # "12th century" and "13th century" are different dates however close they look
+            if _DIGITS_RE.findall(other) != digits:
+                continue
+            score = similarity(grams, trigrams(other))
+            if (score > best_score or (best is None and score == best_score)) and close_words(key, other):
+                best, best_score = slot, score
+        return best
+
+    def resolve(self, name, ont_class):
+        # The individual `name` refers to: a known one of the same class with the same key, a close match
+        # of the same class, or a new one
+        key = normalize_name(name)
+        if not key:
+            return individual_name(name)
+        class_id = self._class_ids.get(CLASS_ALIASES.get(ont_class, ont_class))
+        slot = self._lookup(key, class_id) if class_id is not None else None
+        if slot is not None:
+            self.exact_hits += 1
+            return self._names[slot]
+        slot = self._fuzzy(key, class_id) if class_id is not None else None
+        if slot is None:
+            return self._names[self.add(individual_name(name), ont_class, key)]
+        self.fuzzy_hits += 1
+        # Remembered as an alias, so the next mention of this spelling is an exact hit
+        self._remember(key, slot)
+        return self._names[slot]
+
+    def object_name(self, name):
+        # Object property values point at the individual their mention resolved to, if any
+        slot = self._slots.get(normalize_name(name))
+        return self._names[slot] if slot is not None else individual_name(name)
+
+    def is_new(self, subject, class_type, data, obj_data):
+        digest = hashlib.blake2b(repr((subject, class_type, sorted(data.items()), sorted(obj_data.items())))
+                                 .encode("utf-8"), digest_size=8).digest()
+        if digest in self._emitted:
+            return False
+        self._emitted.add(digest)
+        return True
+
+    def link_graph(self, graph, namespace=NAMESPACE):
+        # Mentions of individuals already in the ontology resolve to their IRIs. Each is known by its
+        # names, labels and its local name split at capitals ("NationalMuseumVlore")
+        linked = 0
+        for s in sorted(set(graph.subjects(RDF.type, OWL.NamedIndividual))):
+            if not isinstance(s, URIRef) or not str(s).startswith(namespace):
+                continue
+            local = str(s)[len(namespace):]
+            classes = sorted(str(o)[len(namespace):] for o in graph.objects(s, RDF.type)
+                             if str(o).startswith(namespace))
+            ont_class = classes[0] if classes else "Thing"
+            names = [str(o) for o in graph.objects(s, URIRef(namespace + "hasName"))]
+            names += [str(o) for o in graph.objects(s, RDFS.label)]
+            names.append(_CAMEL_RE.sub(" ", local))
+            class_id = self._class_id(ont_class)
+            for name in names:
+                key = normalize_name(name)
+                if key and self._lookup(key, class_id) is None:
+                    self.add(local, ont_class, key)
+            linked += 1
+        return linked
+
+    def link_ontology(self, path):
+        graph = Graph()
+        graph.parse(path)
+        return self.link_graph(graph)
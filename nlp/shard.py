@@ -0,0 +1,138 @@
+import argparse
+import gzip
+import heapq
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from NLP import (MODEL_NAME, UNUSED_COMPONENTS, extract_mentions, get_nlp, object_name, ontology_schema, registry,
+                 resolve_mentions)
+from ingest import enumerate_documents
+from rdf_writer import RDFWriter
+
+_SHARD_RE = re.compile(r"^part-(\d{5})-of-(\d{5})\.jsonl\.gz$")
+
+
+def shard_path(directory, shard, shards):
+    return os.path.join(directory, f"part-{shard:05d}-of-{shards:05d}.jsonl.gz")
+
+
+def map_shard(path, directory, shard, shards, text_field="text", batch_size=64, model=MODEL_NAME,
+              exclude=UNUSED_COMPONENTS):
+    # Every `shards`-th document from `shard` on, one line per document: its index in the corpus and its
+    # mentions. Names are left unresolved; the reducer turns them into individuals in corpus order
+    nlp = get_nlp(model, exclude)
+    texts = ((text, i) for i, text in enumerate_documents(path, text_field, shard, shards))
+    out = shard_path(directory, shard, shards)
+    docs = 0
+    with gzip.open(out + ".tmp", "wt", encoding="utf-8", compresslevel=1) as f:
+        for doc, i in nlp.pipe(texts, batch_size=batch_size, as_tuples=True):
+            f.write(json.dumps([i, extract_mentions(doc)], ensure_ascii=False) + "\n")
+            docs += 1
+    # Only finished shards carry the final name, so the reducer never reads a partial one
+    os.replace(out + ".tmp", out)
+    return docs
+
+
+def find_shards(directory):
+    runs = {}
+    for name in os.listdir(directory):
+        m = _SHARD_RE.match(name)
+        if m:
+            runs.setdefault(int(m.group(2)), {})[int(m.group(1))] = os.path.join(directory, name)
+    if len(runs) != 1:
+        raise Exception(f"Expected the shards of one run in '{directory}', found runs of {sorted(runs)} shards")
+    shards, parts = runs.popitem()
+    missing = sorted(set(range(shards)) - set(parts))
+    if missing:
+        raise Exception(f"Shards {missing} of {shards} are missing from '{directory}'")
+    return [parts[i] for i in range(shards)]
+
+
+def read_shard(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def reduced_entities(paths):
+    # Documents come back in corpus order whatever the number of shards, so individuals are resolved
+    # and written exactly as a single process would
+    for _, mentions in heapq.merge(*(read_shard(path) for path in paths), key=lambda record: record[0]):
+        yield from resolve_mentions(mentions)
+
+
+def reduce_shards(directory, output, fmt=None):
+    with RDFWriter(output, ontology_schema, object_name, fmt) as writer:
+        writer.write_all(reduced_entities(find_shards(directory)))
+    return writer
+
+
+def map_all(path, directory, workers, text_field="text", batch_size=64, model=MODEL_NAME, exclude=UNUSED_COMPONENTS):
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if _SHARD_RE.match(name):
+            os.remove(os.path.join(directory, name))
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(map_shard, path, directory, shard, workers, text_field, batch_size, model, exclude)
+                   for shard in range(workers)]
+        return sum(future.result() for future in futures)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract individuals from a corpus in parallel shards.")
+    parser.add_argument("command", choices=["run", "map", "reduce"],
+                        help="run: map with local worker processes, then reduce; map: process one shard "
+                             "(e.g. on another machine); reduce: merge the shards into one output")
+    parser.add_argument("input", nargs="?", help="directory of .txt files, a .jsonl file or a single text file")
+    parser.add_argument("-o", "--output", default="heritage_output.ttl",
+                        help="output file; a .gz suffix compresses it")
+    parser.add_argument("--format", choices=["ttl", "nt"],
+                        help="Turtle or N-Triples (default: from the output extension)")
+    parser.add_argument("--shard-dir", default="heritage_output.shards")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes for 'run'")
+    parser.add_argument("--shard", type=int, help="shard to process for 'map'")
+    parser.add_argument("--shards", type=int, help="total number of shards for 'map'")
+    parser.add_argument("--text-field", default="text", help="JSONL field holding the document text")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--exclude", default=",".join(UNUSED_COMPONENTS),
+                        help="comma-separated pipeline components to leave out")
+    parser.add_argument("--ontology", default="cultural_heritage_ontology.ttl",
+                        help="link mentions to the individuals of this ontology when it exists ('' to skip)")
+    parser.add_argument("--fuzzy-threshold", type=float, default=registry.threshold,
+                        help="trigram similarity above which a mention joins an individual of the same class")
+    args = parser.parse_args(argv)
+    exclude = [name for name in args.exclude.split(",") if name]
+
+    if args.command in ("run", "map") and not args.input:
+        parser.error(f"'{args.command}' needs an input corpus")
+    if args.command == "map":
+        if args.shard is None or args.shards is None or not 0 <= args.shard < args.shards:
+            parser.error("'map' needs --shard and --shards, with 0 <= shard < shards")
+        os.makedirs(args.shard_dir, exist_ok=True)
+        docs = map_shard(args.input, args.shard_dir, args.shard, args.shards, args.text_field, args.batch_size,
+                         args.model, exclude)
+        print(f" Shard {args.shard} of {args.shards}: {docs} documents written to '{args.shard_dir}'")
+        return
+
+    if args.command == "run":
+        start = time.perf_counter()
+        docs = map_all(args.input, args.shard_dir, args.workers, args.text_field, args.batch_size, args.model, exclude)
+        elapsed = time.perf_counter() - start
+        print(f" {docs} documents in {args.workers} shards, {docs / elapsed if elapsed else 0.0:.1f} docs/sec")
+
+    registry.threshold = args.fuzzy_threshold
+    if args.ontology and os.path.exists(args.ontology):
+        linked = registry.link_ontology(args.ontology)
+        print(f" Linking mentions to {linked} individuals of '{args.ontology}'")
+    writer = reduce_shards(args.shard_dir, args.output, args.format)
+    kind = "N-Triples" if writer.fmt == "nt" else "Turtle"
+    print(f" {writer.count} entities saved in {kind} format to '{args.output}'")
+    print(f" {len(registry)} individuals; {registry.exact_hits} repeated and {registry.fuzzy_hits} near-identical mentions resolved")
+
+
+if __name__ == "__main__":
+    main()
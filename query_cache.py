@@ -0,0 +1,123 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_LITERAL_RE = re.compile(r'("""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\')')
+
+
+def normalize_query(query):
+    # Collapse whitespace outside string literals so formatting differences share a cache entry
+    parts = _LITERAL_RE.split(query)
+    for i in range(0, len(parts), 2):
+        parts[i] = ' '.join(parts[i].split())
+    return ' '.join(p for p in parts if p)
+
+
+def file_version(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def _estimate_size(rows):
+    size = 64
+    for row in rows:
+        size += 64
+        for var, term in row.items():
+            size += 120 + len(var) + len(term['value'])
+    return size
+
+
+class QueryCache:
+    def __init__(self, max_entries=2048, max_bytes=64 * 1024 * 1024, ttl=3600.0,
+                 version_source=None, check_interval=5.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version_source = version_source
+        self.check_interval = check_interval
+        self.version = version_source() if version_source else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._last_check = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, query):
+        if not self.enabled:
+            return None
+        self._check_version()
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, query, rows):
+        if not self.enabled:
+            return
+        key = normalize_query(query)
+        size = _estimate_size(rows) + len(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, rows, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, version=None):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+            if version is not None:
+                self.version = version
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'version': self.version,
+            }
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _check_version(self):
+        if self.version_source is None:
+            return
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        version = self.version_source()
+        if version != self.version:
+            self.invalidate(version)
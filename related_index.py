@@ -0,0 +1,163 @@
+import sys
+import threading
+from array import array
+
+
+class RelatedIndex:
+    def __init__(self, properties):
+        self.properties = list(properties)
+        self.version = None
+        self.loaded = False
+        self._prop_ids = {prop: i for i, prop in enumerate(self.properties)}
+        # Interned terms. Values are keys the caller derives from the full RDF term (see term_key in
+        # sparql_service), so literals of different datatypes or languages never collide
+        self._terms = []
+        self._term_ids = {}
+        self._labels = {}
+        # (prop_id << 32 | value_id) -> subject ids, and (prop_id << 32 | subject_id) -> value ids
+        self._postings = {}
+        self._values = {}
+        # Posting lists as URIs in sorted order, built on first use and dropped when the list changes
+        self._sorted = {}
+        self._lock = threading.RLock()
+
+    def add(self, subject, prop, value):
+        prop_id = self._prop_ids.get(prop)
+        if prop_id is None:
+            return
+        with self._lock:
+            s = self._intern(subject)
+            v = self._intern(value)
+            values = self._values.setdefault(prop_id << 32 | s, array('I'))
+            if v in values:
+                return
+            values.append(v)
+            self._postings.setdefault(prop_id << 32 | v, array('I')).append(s)
+            self._sorted.pop(prop_id << 32 | v, None)
+
+    def remove(self, subject, prop, value):
+        prop_id = self._prop_ids.get(prop)
+        s = self._term_ids.get(subject)
+        v = self._term_ids.get(value)
+        if prop_id is None or s is None or v is None:
+            return
+        with self._lock:
+            values = self._values.get(prop_id << 32 | s)
+            if values is None or v not in values:
+                return
+            values.remove(v)
+            if not values:
+                del self._values[prop_id << 32 | s]
+            self._sorted.pop(prop_id << 32 | v, None)
+            subjects = self._postings[prop_id << 32 | v]
+            subjects.remove(s)
+            if not subjects:
+                del self._postings[prop_id << 32 | v]
+
+    def set_label(self, subject, label):
+        with self._lock:
+            if label is None:
+                self._labels.pop(self._intern(subject), None)
+            else:
+                self._labels[self._intern(subject)] = sys.intern(label)
+
+    def refresh(self, triples, labels, version=None):
+        # triples: (subject, prop, value); labels: subject -> label. Only the difference is applied.
+        triples = set(triples)
+        with self._lock:
+            current = set(self.triples())
+            for triple in current - triples:
+                self.remove(*triple)
+            for triple in triples - current:
+                self.add(*triple)
+            for s in set(self._labels) - {self._term_ids.get(subject) for subject in labels}:
+                del self._labels[s]
+            for subject, label in labels.items():
+                self.set_label(subject, label)
+            self.version = version
+            self.loaded = True
+
+    def invalidate(self):
+        self.loaded = False
+
+    def triples(self):
+        for key, values in self._values.items():
+            prop = self.properties[key >> 32]
+            subject = self._terms[key & 0xFFFFFFFF]
+            for v in values:
+                yield subject, prop, self._terms[v]
+
+    def first_value(self, subject, prop):
+        s = self._term_ids.get(subject)
+        prop_id = self._prop_ids.get(prop)
+        if s is None or prop_id is None:
+            return None
+        values = self._values.get(prop_id << 32 | s)
+        if not values:
+            return None
+        return self._terms[values[0]]
+
+    def subjects(self, prop, value, exclude=None, limit=10):
+        prop_id = self._prop_ids.get(prop)
+        v = self._term_ids.get(value)
+        if prop_id is None or v is None:
+            return []
+        skip = self._term_ids.get(exclude)
+        result = []
+        for s in self._postings.get(prop_id << 32 | v, ()):
+            if s != skip:
+                result.append(self._terms[s])
+                if len(result) == limit:
+                    break
+        return result
+
+    def sorted_subjects(self, prop, value):
+        # Every subject with `value`, in URI order, for paging with bisect
+        prop_id = self._prop_ids.get(prop)
+        v = self._term_ids.get(value)
+        if prop_id is None or v is None:
+            return []
+        key = prop_id << 32 | v
+        with self._lock:
+            subjects = self._sorted.get(key)
+            if subjects is None:
+                subjects = self._sorted[key] = sorted(self._terms[s] for s in self._postings.get(key, ()))
+            return subjects
+
+    def related(self, subject, prop, limit=10):
+        first = self.first_value(subject, prop)
+        if first is None:
+            return []
+        return self.subjects(prop, first, exclude=subject, limit=limit)
+
+    def label(self, uri):
+        s = self._term_ids.get(uri)
+        label = self._labels.get(s) if s is not None else None
+        return label if label is not None else uri.split('/')[-1]
+
+    def memory_usage(self):
+        term_bytes = sys.getsizeof(self._terms) + sys.getsizeof(self._term_ids)
+        term_bytes += sum(sys.getsizeof(t) for t in self._terms)
+        posting_bytes = sys.getsizeof(self._postings) + sys.getsizeof(self._values)
+        posting_bytes += sum(sys.getsizeof(a) for a in self._postings.values())
+        posting_bytes += sum(sys.getsizeof(a) for a in self._values.values())
+        label_bytes = sys.getsizeof(self._labels) + sum(sys.getsizeof(l) for l in self._labels.values())
+        return {
+            'terms': len(self._terms),
+            'postings': len(self._postings),
+            'subject_values': len(self._values),
+            'labels': len(self._labels),
+            'term_bytes': term_bytes,
+            'posting_bytes': posting_bytes,
+            'label_bytes': label_bytes,
+            'total_bytes': term_bytes + posting_bytes + label_bytes,
+        }
+
+    def _intern(self, term):
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = len(self._terms)
+            term = sys.intern(term)
+            self._terms.append(term)
+            self._term_ids[term] = term_id
+        return term_id
@@ -0,0 +1,135 @@
+import bisect
+import threading
+import unicodedata
+
+# Prefixes as short as "a" match most of a large index; ranking stops after this many entries
+MAX_PREFIX_CANDIDATES = 2000
+
+
+def fold(text):
+    # Accent-insensitive, case-insensitive form: "Gjirokastër" and "gjirokaster" fold to the same key
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.casefold().split())
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    def __init__(self):
+        self.version = None
+        self.loaded = False
+        self._entries = {}
+        self._ids = {}
+        self._next_id = 0
+        self._grams = {}
+        self._words = []
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, uri, label):
+        with self._lock:
+            if (uri, label) not in self._ids:
+                for word in self._index(uri, label):
+                    bisect.insort(self._words, word)
+
+    def remove(self, uri, label):
+        with self._lock:
+            if (uri, label) in self._ids:
+                entry_id, words = self._unindex(uri, label)
+                for word in words:
+                    del self._words[bisect.bisect_left(self._words, (word, entry_id))]
+
+    def refresh(self, pairs, version=None):
+        # Apply only the difference, so a reload after merge.py touches just the new labels. The word list
+        # is filtered and sorted once rather than edited per label, which is quadratic on a first build
+        pairs = set(pairs)
+        with self._lock:
+            removed = set(self._ids) - pairs
+            if removed:
+                dropped = {self._unindex(uri, label)[0] for uri, label in removed}
+                self._words = [word for word in self._words if word[1] not in dropped]
+            added = []
+            for uri, label in pairs - set(self._ids):
+                added.extend(self._index(uri, label))
+            if added:
+                self._words.extend(added)
+                self._words.sort()
+            self.version = version
+            self.loaded = True
+
+    def _index(self, uri, label):
+        # Registers the entry and its trigrams; returns its (word, id) pairs for the word list
+        entry_id = self._next_id
+        self._next_id += 1
+        folded = fold(label)
+        self._ids[(uri, label)] = entry_id
+        self._entries[entry_id] = (uri, label, folded)
+        for gram in _trigrams(folded):
+            self._grams.setdefault(gram, set()).add(entry_id)
+        return [(word, entry_id) for word in set(folded.split())]
+
+    def _unindex(self, uri, label):
+        entry_id = self._ids.pop((uri, label))
+        _, _, folded = self._entries.pop(entry_id)
+        for gram in _trigrams(folded):
+            postings = self._grams[gram]
+            postings.discard(entry_id)
+            if not postings:
+                del self._grams[gram]
+        return entry_id, set(folded.split())
+
+    def invalidate(self):
+        self.loaded = False
+
+    def search(self, query, limit=10):
+        q = fold(query)
+        if not q:
+            return []
+        with self._lock:
+            candidates = self._word_prefix(q)
+            # Substring matches rank below word prefixes, so they are only looked up to fill the page
+            if len(q) >= 3 and len({self._entries[i][0] for i in candidates}) < limit:
+                postings = sorted((self._grams.get(g, set()) for g in _trigrams(q)), key=len)
+                if postings[0]:
+                    candidates.update(i for i in set.intersection(*postings) if q in self._entries[i][2])
+            return self._rank(q, candidates, limit)
+
+    def complete(self, prefix, limit=10):
+        q = fold(prefix)
+        if not q:
+            return []
+        with self._lock:
+            return self._rank(q, self._word_prefix(q), limit)
+
+    def _word_prefix(self, q):
+        # Words equal to the prefix sort first, so a capped scan keeps the exact word matches
+        ids = set()
+        i = bisect.bisect_left(self._words, (q, -1))
+        while i < len(self._words) and self._words[i][0].startswith(q) and len(ids) < MAX_PREFIX_CANDIDATES:
+            ids.add(self._words[i][1])
+            i += 1
+        return ids
+
+    def _rank(self, q, candidates, limit):
+        # Exact match, then label prefix, then word prefix, then any substring; shorter labels first
+        best = {}
+        for entry_id in candidates:
+            uri, label, folded = self._entries[entry_id]
+            if folded == q:
+                tier = 0
+            elif folded.startswith(q):
+                tier = 1
+            elif (' ' + folded).find(' ' + q) >= 0:
+                tier = 2
+            else:
+                tier = 3
+            key = (tier, len(folded), folded, uri)
+            if uri not in best or key < best[uri][0]:
+                best[uri] = (key, label)
+        ranked = sorted(best.items(), key=lambda item: item[1][0])
+        return [(uri, label) for uri, (_, label) in ranked[:limit]]
@@ -0,0 +1,36 @@
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+
+# Each worker keeps its own query cache and indexes, so a few workers with several threads each
+# use memory better than one worker per request
+OPTIONS = {
+    "bind": os.environ.get("BIND", "0.0.0.0:5002"),
+    "workers": int(os.environ.get("WEB_WORKERS", str(min(multiprocessing.cpu_count(), 4)))),
+    "threads": int(os.environ.get("WEB_THREADS", "8")),
+    "worker_class": "gthread",
+    "timeout": int(os.environ.get("WEB_TIMEOUT", "60")),
+    "keepalive": 5,
+    "accesslog": os.environ.get("WEB_ACCESS_LOG") or None,
+}
+
+
+class ExplorerApplication(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        # Imported in each worker after the fork, so no worker shares the parent's HTTP connections
+        from sparql_service import app
+        return app
+
+
+if __name__ == "__main__":
+    ExplorerApplication(OPTIONS).run()
@@ -0,0 +1,250 @@
+import argparse
+import bisect
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from functools import lru_cache
+
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.store import Store
+from rdflib.util import guess_format
+
+from query_cache import file_version
+
+# Layout: header, source fingerprint, term offsets (uint32), term bytes, then three uint32 triple
+# tables sorted as (s, p, o), (p, o, s) and (o, s, p). Everything after the header is read in place.
+MAGIC = b"ACHSNAP1"
+_HEADER = struct.Struct("<8s1sxxxIIII")
+_ORDERS = {"spo": (0, 1, 2), "pos": (1, 2, 0), "osp": (2, 0, 1)}
+
+
+def source_fingerprint(paths):
+    # Same mtime/size signature the query cache uses, plus the file names so a different set never matches
+    return "|".join(f"{os.path.basename(path)}:{file_version(path) or '-'}" for path in paths)
+
+
+def encode_term(term):
+    # Terms are sorted by these keys, so a term's id doubles as its position in the dictionary
+    if isinstance(term, URIRef):
+        return b"U" + str(term).encode("utf-8")
+    if isinstance(term, BNode):
+        return b"B" + str(term).encode("utf-8")
+    if isinstance(term, Literal):
+        lang = (term.language or "").encode("utf-8")
+        datatype = (str(term.datatype) if term.datatype else "").encode("utf-8")
+        return b"L" + lang + b"\x00" + datatype + b"\x00" + str(term).encode("utf-8")
+    raise Exception(f"Cannot store term in a snapshot: {term!r}")
+
+
+def decode_term(key):
+    kind, rest = key[:1], key[1:]
+    if kind == b"U":
+        return URIRef(rest.decode("utf-8"))
+    if kind == b"B":
+        return BNode(rest.decode("utf-8"))
+    lang, datatype, lexical = rest.split(b"\x00", 2)
+    return Literal(lexical.decode("utf-8"), lang=lang.decode("utf-8") or None,
+                   datatype=URIRef(datatype.decode("utf-8")) if datatype else None)
+
+
+def _padding(size):
+    return b"\x00" * (-size % 8)
+
+
+def write_snapshot(graph, path, fingerprint):
+    keys = sorted({encode_term(term) for triple in graph for term in triple})
+    ids = {key: i for i, key in enumerate(keys)}
+    offsets = array("I", [0])
+    for key in keys:
+        offsets.append(offsets[-1] + len(key))
+    blob = b"".join(keys)
+    if len(blob) >= 1 << 32:
+        raise Exception(f"Term dictionary too large for a snapshot: {len(blob)} bytes")
+    # A set, so a triple listed twice is stored once, as in a graph
+    triples = sorted({(ids[encode_term(s)], ids[encode_term(p)], ids[encode_term(o)]) for s, p, o in graph})
+    fp = fingerprint.encode("utf-8")
+    byteorder = b"<" if sys.byteorder == "little" else b">"
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, byteorder, len(fp), len(keys), len(triples), len(blob)))
+        f.write(fp + _padding(len(fp)))
+        f.write(offsets.tobytes() + _padding(len(offsets) * 4))
+        f.write(blob + _padding(len(blob)))
+        for order in _ORDERS.values():
+            table = array("I")
+            for triple in sorted(triples, key=lambda t: (t[order[0]], t[order[1]], t[order[2]])):
+                table.extend(triple[i] for i in order)
+            f.write(table.tobytes())
+    # A reader that mapped the old file keeps its pages; new readers see the complete new file
+    os.replace(tmp, path)
+    return len(triples)
+
+
+class SnapshotStore(Store):
+    # Read-only rdflib store answering triple patterns straight from the mapped file
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, byteorder, fp_len, n_terms, n_triples, blob_len = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise Exception(f"Not an ontology snapshot: {path}")
+        if byteorder != (b"<" if sys.byteorder == "little" else b">"):
+            raise Exception(f"Snapshot was written on a machine with a different byte order: {path}")
+        pos = _HEADER.size
+        self.fingerprint = bytes(view[pos:pos + fp_len]).decode("utf-8")
+        pos += fp_len + len(_padding(fp_len))
+        self._offsets = view[pos:pos + (n_terms + 1) * 4].cast("I")
+        pos += (n_terms + 1) * 4 + len(_padding((n_terms + 1) * 4))
+        self._blob = view[pos:pos + blob_len]
+        pos += blob_len + len(_padding(blob_len))
+        self._tables = {}
+        for name in _ORDERS:
+            table = view[pos:pos + n_triples * 12].cast("I")
+            self._tables[name] = (table[0::3], table[1::3], table[2::3])
+            pos += n_triples * 12
+        self.term_count = n_terms
+        self.triple_count = n_triples
+        self._namespaces = {}
+        self.term = lru_cache(maxsize=1 << 16)(self._decode)
+        self.term_id = lru_cache(maxsize=1 << 12)(self._lookup)
+
+    def _key(self, term_id):
+        return bytes(self._blob[self._offsets[term_id]:self._offsets[term_id + 1]])
+
+    def _decode(self, term_id):
+        return decode_term(self._key(term_id))
+
+    def _lookup(self, term):
+        try:
+            key = encode_term(term)
+        except Exception:
+            return None
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.term_count and self._key(lo) == key else None
+
+    def triples(self, triple_pattern, context=None):
+        bound = []
+        for term in triple_pattern:
+            if term is None:
+                bound.append(None)
+                continue
+            term_id = self.term_id(term)
+            if term_id is None:
+                return
+            bound.append(term_id)
+        s, p, o = bound
+        if s is not None:
+            name, keys = ("osp", (o, s)) if o is not None and p is None else ("spo", (s, p, o))
+        elif p is not None:
+            name, keys = "pos", (p, o)
+        elif o is not None:
+            name, keys = "osp", (o,)
+        else:
+            name, keys = "spo", ()
+        columns = self._tables[name]
+        lo, hi = 0, self.triple_count
+        for column, key in zip(columns, keys):
+            if key is None:
+                break
+            lo, hi = bisect.bisect_left(column, key, lo, hi), bisect.bisect_right(column, key, lo, hi)
+        order = _ORDERS[name]
+        term = self.term
+        for i in range(lo, hi):
+            triple = [None, None, None]
+            for column, position in zip(columns, order):
+                triple[position] = term(column[i])
+            yield tuple(triple), iter(())
+
+    def __len__(self, context=None):
+        return self.triple_count
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def add(self, triple, context, quoted=False):
+        raise Exception("Ontology snapshots are read-only")
+
+    def remove(self, triple, context=None):
+        raise Exception("Ontology snapshots are read-only")
+
+    def bind(self, prefix, namespace, override=True):
+        self._namespaces[prefix] = namespace
+
+    def namespace(self, prefix):
+        return self._namespaces.get(prefix)
+
+    def prefix(self, namespace):
+        for prefix, ns in self._namespaces.items():
+            if ns == namespace:
+                return prefix
+        return None
+
+    def namespaces(self):
+        return iter(list(self._namespaces.items()))
+
+
+def parse_sources(paths):
+    graph = Graph()
+    for path in paths:
+        graph.parse(path, format=guess_format(path) or "turtle")
+    return graph
+
+
+def open_snapshot(path, fingerprint=None):
+    # None when the file is missing, unreadable or was built from other sources
+    try:
+        store = SnapshotStore(path)
+    except Exception:
+        return None
+    if fingerprint is not None and store.fingerprint != fingerprint:
+        return None
+    return Graph(store=store)
+
+
+def load_graph(paths, snapshot_path):
+    fingerprint = source_fingerprint(paths)
+    graph = open_snapshot(snapshot_path, fingerprint)
+    if graph is not None:
+        return graph
+    graph = parse_sources(paths)
+    try:
+        write_snapshot(graph, snapshot_path, fingerprint)
+    except OSError as e:
+        print(f" Could not write ontology snapshot '{snapshot_path}': {e}", file=sys.stderr)
+        return graph
+    return open_snapshot(snapshot_path, fingerprint) or graph
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile ontology files into a memory-mappable snapshot.")
+    parser.add_argument("sources", nargs="+", help="RDF files to compile, in load order")
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    graph = parse_sources(args.sources)
+    count = write_snapshot(graph, args.output, source_fingerprint(args.sources))
+    size = os.path.getsize(args.output)
+    print(f" {count} triples written to '{args.output}' ({size / 1024:.0f} KiB) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from rdflib import BNode, URIRef
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from query_cache import file_version
+from snapshot import load_graph, parse_sources
+
+
+class SparqlClient:
+    def __init__(self, endpoint, pool_size=10, timeout=30.0, retries=3, backoff=0.3):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['Accept'] = 'application/sparql-results+json'
+        # SPARQL queries are read-only, so retrying the POST is safe
+        retry = Retry(total=retries, backoff_factor=backoff,
+                      status_forcelist=(429, 502, 503, 504), allowed_methods=None)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='sparql')
+
+    def query(self, query):
+        response = self.session.post(self.endpoint, data={'query': query}, timeout=self.timeout)
+        if response.status_code != 200:
+            raise Exception(f"SPARQL query failed: {response.text}")
+        return response.json()['results']['bindings']
+
+    def query_many(self, queries):
+        # Independent queries share the connection pool, so the batch takes as long as its slowest query
+        return list(self.executor.map(self.query, queries))
+
+    async def query_async(self, query):
+        # The pool's threads bound how many queries all requests together have in flight
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.query, query)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+
+def _term_json(term):
+    if isinstance(term, URIRef):
+        return {'type': 'uri', 'value': str(term)}
+    if isinstance(term, BNode):
+        return {'type': 'bnode', 'value': str(term)}
+    binding = {'type': 'literal', 'value': str(term)}
+    if term.language:
+        binding['xml:lang'] = term.language
+    elif term.datatype:
+        binding['datatype'] = str(term.datatype)
+    return binding
+
+
+class EmbeddedSparqlClient:
+    def __init__(self, paths, check_interval=5.0, snapshot_path=None):
+        self.paths = list(paths)
+        self.snapshot_path = snapshot_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._last_check = time.monotonic()
+        self.graph, self.loaded_version = self._load()
+
+    @property
+    def version(self):
+        self.refresh()
+        return self.loaded_version
+
+    def refresh(self):
+        # Pick up files regenerated by merge.py without restarting the process
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            if self._files_version() != self.loaded_version:
+                self.reload()
+
+    def reload(self):
+        with self._lock:
+            graph, version = self._load()
+            self.graph, self.loaded_version = graph, version
+
+    def query(self, query):
+        self.refresh()
+        try:
+            result = self.graph.query(query)
+        except Exception as e:
+            raise Exception(f"SPARQL query failed: {e}")
+        variables = [str(v) for v in result.vars]
+        rows = []
+        for row in result:
+            binding = {}
+            for var, term in zip(variables, row):
+                if term is not None:
+                    binding[var] = _term_json(term)
+            rows.append(binding)
+        return rows
+
+    def query_many(self, queries):
+        # Queries are CPU-bound in-process, threads would only contend for the GIL
+        return [self.query(q) for q in queries]
+
+    async def query_async(self, query):
+        return self.query(query)
+
+    def close(self):
+        pass
+
+    def _files_version(self):
+        return '.'.join(file_version(path) or '-' for path in self.paths)
+
+    def _load(self):
+        version = self._files_version()
+        if self.snapshot_path:
+            # Maps the compiled snapshot, rebuilding it first when the data files have changed
+            return load_graph(self.paths, self.snapshot_path), version
+        return parse_sources(self.paths), version
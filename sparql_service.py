@@ -1,9 +1,32 @@
-from flask import Flask, request, render_template_string
-import requests
+import asyncio
+import base64
+import bisect
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import Flask, Response, abort, g, jsonify, request, render_template_string, stream_with_context, url_for
+
+from materialize import ProfileRefresher, ProfileStore
+from metrics import Metrics
+from query_cache import QueryCache, file_version
+from related_index import RelatedIndex
+from search_index import SearchIndex
+from sparql_client import EmbeddedSparqlClient, SparqlClient
 
 app = Flask(__name__)
 
-FUSEKI_ENDPOINT = "http://localhost:3030/albanian_cultural_heritage_ds/sparql"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# "remote" talks to Fuseki, "embedded" answers the same SPARQL in-process from SPARQL_DATA_FILES
+SPARQL_BACKEND = os.environ.get("SPARQL_BACKEND", "remote")
+FUSEKI_ENDPOINT = os.environ.get("FUSEKI_ENDPOINT", "http://localhost:3030/albanian_cultural_heritage_ds/sparql")
+SPARQL_DATA_FILES = os.environ.get("SPARQL_DATA_FILES", os.path.join(BASE_DIR, "Ontology.rdf")).split(os.pathsep)
+# Compiled, memory-mapped copy of SPARQL_DATA_FILES for the embedded backend; set to "" to always parse
+SPARQL_SNAPSHOT = os.environ.get("SPARQL_SNAPSHOT", os.path.join(BASE_DIR, "Ontology.snapshot"))
 PREFIXES = """
 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
@@ -12,181 +35,538 @@ PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
 PREFIX ex: <http://www.semanticweb.org/ana/ontologies/2025/4/albania/>
 """
 
+EX = "http://www.semanticweb.org/ana/ontologies/2025/4/albania/"
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+RDFS_LABEL = "http://www.w3.org/2000/01/rdf-schema#label"
+OWL_NAMED_INDIVIDUAL = "http://www.w3.org/2002/07/owl#NamedIndividual"
+XSD_STRING = "http://www.w3.org/2001/XMLSchema#string"
+
+DATA_PROPS = [
+    'hasArchitecturalStyle', 'hasConstructionDate', 'hasCreator', 'hasCulturalContext',
+    'hasCulturalHeritageStatus', 'hasCulturalSignificance', 'hasDateOfDiscovery',
+    'hasEventDuration', 'hasExactDate', 'hasLanguage', 'hasLocationType',
+    'hasMaterial', 'hasName', 'hasPeriodOfUse', 'hasReligion',
+    'hasRestorationDate', 'hasStartDate', 'hasUNESCODesignation', 'hasWebsite',
+    'hasLocation'
+]
+
+OBJECT_PROPS = [
+    'displays', 'commemorates', 'exhibitedIn', 'associatedWithEvent',
+    'locatedIn', 'originatedFrom', 'datedFrom',
+    'hasHistoricalPeriod', 'occurredIn', 'occurredOn', 'isPartOf'
+]
+
+if SPARQL_BACKEND == "embedded":
+    client = EmbeddedSparqlClient(SPARQL_DATA_FILES, snapshot_path=SPARQL_SNAPSHOT or None)
+elif SPARQL_BACKEND == "remote":
+    client = SparqlClient(
+        FUSEKI_ENDPOINT,
+        pool_size=int(os.environ.get("SPARQL_POOL_SIZE", "10")),
+        timeout=float(os.environ.get("SPARQL_TIMEOUT", "30")),
+        retries=int(os.environ.get("SPARQL_RETRIES", "3")),
+        backoff=float(os.environ.get("SPARQL_BACKOFF", "0.3")),
+    )
+else:
+    raise Exception(f"Unknown SPARQL_BACKEND: {SPARQL_BACKEND}")
+
+# Reverse-lookup queries a single page request may have in flight at once (1 = a single UNION)
+REQUEST_CONCURRENCY = max(1, int(os.environ.get("SPARQL_REQUEST_CONCURRENCY", "1")))
+
+# With the remote backend, drop the cache whenever the file loaded into Fuseki is regenerated by merge.py.
+# Once merge.py has pushed to Fuseki it writes DATASET_VERSION_FILE after each successful push, and that
+# file is followed instead, since the merged file changes before the store does
+DATASET_FILE = os.environ.get("DATASET_FILE", os.path.join(BASE_DIR, "nlp", "final_merged_output.ttl"))
+DATASET_VERSION_FILE = os.environ.get("DATASET_VERSION_FILE", os.path.splitext(DATASET_FILE)[0] + ".version")
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Entity pages precomputed into SQLite and served from there; set to "" to build every page on request.
+# The refresher checks for dataset changes every PROFILE_REFRESH_INTERVAL seconds (0 = only when asked)
+# and reads the triples merge.py appended to PROFILE_DELTA_FILES (by default the files the dataset version
+# comes from) to rebuild just the pages they touch
+PROFILE_STORE = os.environ.get("PROFILE_STORE", os.path.join(BASE_DIR, "profiles.sqlite"))
+PROFILE_REFRESH_INTERVAL = float(os.environ.get("PROFILE_REFRESH_INTERVAL", "5"))
+PROFILE_DELTA_FILES = os.environ.get(
+    "PROFILE_DELTA_FILES", os.pathsep.join(SPARQL_DATA_FILES if SPARQL_BACKEND == "embedded" else [DATASET_FILE])
+).split(os.pathsep)
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Rows fetched per query while streaming NDJSON, and how long clients may reuse an API response unrevalidated
+API_STREAM_BATCH = int(os.environ.get("API_STREAM_BATCH", "500"))
+API_MAX_AGE = int(os.environ.get("API_MAX_AGE", "0"))
+
+def dataset_version():
+    if SPARQL_BACKEND == "embedded":
+        return client.version
+    return file_version(DATASET_VERSION_FILE) or file_version(DATASET_FILE)
+
+def dataset_modified():
+    if SPARQL_BACKEND == "embedded":
+        paths = SPARQL_DATA_FILES
+    else:
+        paths = [DATASET_VERSION_FILE] if os.path.exists(DATASET_VERSION_FILE) else [DATASET_FILE]
+    mtimes = [os.path.getmtime(path) for path in paths if os.path.exists(path)]
+    return datetime.fromtimestamp(max(mtimes), timezone.utc) if mtimes else None
+
+cache = QueryCache(
+    max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", "2048")),
+    max_bytes=int(os.environ.get("CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl=float(os.environ.get("CACHE_TTL", "3600")),
+    version_source=dataset_version,
+)
+
+# Queries slower than SLOW_QUERY_MS are logged ("" turns the log off); SERVER_TIMING=1 adds a
+# Server-Timing header breaking each response down by helper
+SLOW_QUERY_MS = os.environ.get("SLOW_QUERY_MS", "500")
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+
+metrics = Metrics(slow_query_ms=float(SLOW_QUERY_MS) if SLOW_QUERY_MS else None)
+metrics.gauge('sparql_cache_entries', 'Query results held in the cache', lambda: cache.stats()['entries'])
+metrics.gauge('sparql_cache_bytes', 'Approximate size of the cached results', lambda: cache.stats()['bytes'])
+
 def run_sparql(query):
     full_query = PREFIXES + query
-    response = requests.post(FUSEKI_ENDPOINT, data={'query': full_query},
-                             headers={'Accept': 'application/sparql-results+json'})
-    if response.status_code != 200:
-        raise Exception(f"SPARQL query failed: {response.text}")
-    return response.json()['results']['bindings']
+    start = time.perf_counter()
+    rows = cache.get(full_query)
+    cached = rows is not None
+    if not cached:
+        rows = client.query(full_query)
+        cache.put(full_query, rows)
+    metrics.observe_query(query, time.perf_counter() - start, len(rows), cached)
+    return rows
+
+def run_sparql_many(queries):
+    full_queries = [PREFIXES + q for q in queries]
+    results = [cache.get(q) for q in full_queries]
+    missing = [i for i, rows in enumerate(results) if rows is None]
+    start = time.perf_counter()
+    for i, rows in zip(missing, client.query_many([full_queries[i] for i in missing])):
+        cache.put(full_queries[i], rows)
+        results[i] = rows
+    missing = set(missing)
+    metrics.observe_batch([(q, len(rows), i not in missing) for i, (q, rows) in enumerate(zip(queries, results))],
+                          time.perf_counter() - start)
+    return results
+
+def run_sparql_uncached(query):
+    # Dataset-wide dumps go straight to the client, they would only crowd the query cache
+    start = time.perf_counter()
+    rows = client.query(PREFIXES + query)
+    metrics.observe_query(query, time.perf_counter() - start, len(rows), False)
+    return rows
+
+USE_RELATED_INDEX = os.environ.get("RELATED_INDEX", "1") == "1"
+
+search_index = SearchIndex()
+related_index = RelatedIndex(DATA_PROPS + OBJECT_PROPS)
+_index_lock = threading.Lock()
 
+def _indexes_current(version):
+    return (search_index.loaded and search_index.version == version and
+            (not USE_RELATED_INDEX or (related_index.loaded and related_index.version == version)))
+
+@metrics.timed
+def ensure_indexes():
+    version = dataset_version()
+    if _indexes_current(version):
+        return
+    with _index_lock:
+        if _indexes_current(version):
+            return
+        rows = run_sparql_uncached("""
+    SELECT ?s ?p ?label WHERE {
+        VALUES ?p { rdfs:label ex:hasName }
+        ?s ?p ?label
+    }
+    """)
+        search_index.refresh(((r['s']['value'], r['label']['value']) for r in rows), version)
+        if not USE_RELATED_INDEX:
+            return
+        labels = {}
+        for r in rows:
+            s = r['s']['value']
+            if r['p']['value'] == RDFS_LABEL:
+                if s not in labels or not labels[s][0]:
+                    labels[s] = (True, r['label']['value'])
+            elif s not in labels:
+                labels[s] = (False, r['label']['value'])
+        values = ' '.join(f'ex:{prop}' for prop in related_index.properties)
+        triples = run_sparql_uncached(f"""
+    SELECT ?s ?p ?o WHERE {{
+        VALUES ?p {{ {values} }}
+        ?s ?p ?o
+    }}
+    """)
+        related_index.refresh(
+            ((r['s']['value'], r['p']['value'][len(EX):], term_key(r['o'])) for r in triples),
+            {s: label for s, (_, label) in labels.items()},
+            version,
+        )
+
+@metrics.timed
+def search_entities(name, limit=10):
+    ensure_indexes()
+    return search_index.search(name, limit)
+
+@metrics.timed
 def get_entity_uri(name):
-    query = f"""
-    SELECT ?s WHERE {{
-        ?s (rdfs:label|ex:hasName) ?label .
-        FILTER(CONTAINS(LCASE(STR(?label)), LCASE("{name}")))
-    }} LIMIT 1
-    """
-    results = run_sparql(query)
-    return results[0]['s']['value'] if results else None
+    matches = search_entities(name, limit=1)
+    return matches[0][0] if matches else None
 
-def get_label(uri):
-    query = f"""
-    SELECT ?label WHERE {{
-        OPTIONAL {{ <{uri}> rdfs:label ?label }}
-        OPTIONAL {{ <{uri}> ex:hasName ?label }}
-        FILTER(BOUND(?label))
-    }} LIMIT 1
+def _first_value_query(uri, prop):
+    return f"""
+    SELECT ?val WHERE {{ <{uri}> ex:{prop} ?val }} LIMIT 1
     """
-    results = run_sparql(query)
-    return results[0]['label']['value'] if results else uri.split('/')[-1]
 
-def get_entity_info(uri):
-    query = f"""
-    SELECT ?prop ?val WHERE {{
+def sparql_literal(val):
+    return '"' + val.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r') + '"'
+
+def term_key(term):
+    # One string per RDF term: URIs as they are, literals quoted with their language or datatype, so
+    # "1970-07-04T00:00:00"^^xsd:dateTime and the plain string "1970-07-04T00:00:00" are different values
+    if term['type'] != 'literal':
+        return term['value']
+    key = '"' + term['value'] + '"'
+    if term.get('xml:lang'):
+        return key + '@' + term['xml:lang']
+    if term.get('datatype') and term['datatype'] != XSD_STRING:
+        return key + '^^' + term['datatype']
+    return key
+
+def literal_key(value, datatype=None, lang=None):
+    return term_key({'type': 'literal', 'value': value, 'datatype': datatype, 'xml:lang': lang})
+
+def split_key(key):
+    # (value, datatype, lang) of a term key; URIs come back as (uri, None, None)
+    if not key.startswith('"'):
+        return key, None, None
+    value, _, suffix = key[1:].rpartition('"')
+    if suffix.startswith('^^'):
+        return value, suffix[2:], None
+    return value, None, suffix[1:] or None
+
+def sparql_term(key):
+    value, datatype, lang = split_key(key)
+    if not key.startswith('"'):
+        return f"<{value}>"
+    if datatype:
+        return f"{sparql_literal(value)}^^<{datatype}>"
+    return sparql_literal(value) + (f"@{lang}" if lang else '')
+
+def _display_label(row, var):
+    return row['label']['value'] if 'label' in row else row[var]['value'].split('/')[-1]
+
+def _item(row, var):
+    return {'uri': row[var]['value'], 'label': _display_label(row, var)}
+
+def _index_item(uri):
+    return {'uri': uri, 'label': related_index.label(uri)}
+
+def _profile_query(uri):
+    return f"""
+    SELECT ?prop ?val ?label WHERE {{
         <{uri}> ?prop ?val .
-        FILTER(!isIRI(?val))
+        OPTIONAL {{ ?val rdfs:label ?label }}
+        OPTIONAL {{ ?val ex:hasName ?label }}
     }}
     """
-    results = run_sparql(query)
+
+def _siblings_query(uri, groups, indexes):
+    branches = []
+    for i in indexes:
+        _, pattern, limit = groups[i]
+        branches.append(f"""
+        {{ SELECT ("{i}" AS ?group) ?s ?label WHERE {{
+            {pattern} .
+            OPTIONAL {{ ?s rdfs:label ?label }}
+            OPTIONAL {{ ?s ex:hasName ?label }}
+            FILTER(?s != <{uri}>)
+        }} LIMIT {limit} }}""")
+    return f"""
+    SELECT ?group ?s ?label WHERE {{{' UNION'.join(branches)}
+    }}
+    """
+
+def _add_siblings(siblings, rows):
+    for r in rows:
+        siblings.setdefault(int(r['group']['value']), []).append(_item(r, 's'))
+
+def _plan_profile(uri, rows, data_props, object_props):
+    # Everything answerable from the entity's own triples, plus the reverse lookups still to run
+    by_prop = {}
+    for r in rows:
+        by_prop.setdefault(r['prop']['value'], []).append(r)
+
+    names = by_prop.get(RDFS_LABEL) or by_prop.get(EX + 'hasName')
+    label = names[0]['val']['value'] if names else uri.split('/')[-1]
+
+    types = []
+    seen_types = set()
+    for r in by_prop.get(RDF_TYPE, []):
+        t = r['val']['value']
+        if t != OWL_NAMED_INDIVIDUAL and t not in seen_types:
+            seen_types.add(t)
+            types.append(t.split('/')[-1])
+
     info = {}
-    for r in results:
+    for r in rows:
+        if r['val']['type'] == 'uri':
+            continue
         prop = r['prop']['value'].split('/')[-1]
         val = r['val']['value']
         if prop not in info:
             info[prop] = []
         if val not in info[prop]:
             info[prop].append(val)
-    return info
 
-def get_entity_types(uri):
-    query = f"""
-    SELECT ?type WHERE {{
-        <{uri}> rdf:type ?type .
-        FILTER(?type != owl:NamedIndividual)
+    related_objects = []
+    for prop in object_props:
+        prop_rows = by_prop.get(EX + prop, [])[:10]
+        if prop_rows:
+            related_objects.append((prop, [_item(r, 'val') for r in prop_rows]))
+
+    # Properties covered by the related index are answered from memory instead of a query
+    groups = []
+    siblings = {}
+    shared_values = {}
+    for prop in data_props:
+        prop_rows = by_prop.get(EX + prop)
+        if prop_rows:
+            key = term_key(prop_rows[0]['val'])
+            if USE_RELATED_INDEX and prop in related_index.properties:
+                subjects = related_index.subjects(prop, key, exclude=uri, limit=10)
+                siblings[len(groups)] = [_index_item(s) for s in subjects]
+            groups.append((prop, f"?s ex:{prop} {sparql_term(key)}", 10))
+            shared_values[prop] = key
+    museum_rows = by_prop.get(EX + 'exhibitedIn')
+    museum = None
+    if museum_rows:
+        museum = _item(museum_rows[0], 'val')
+        museum_uri = museum['uri']
+        if USE_RELATED_INDEX:
+            subjects = related_index.subjects('exhibitedIn', museum_uri, exclude=uri, limit=15)
+            siblings[len(groups)] = [_index_item(s) for s in subjects]
+        groups.append((None, f"?s ex:exhibitedIn <{museum_uri}>", 15))
+
+    profile = {
+        'uri': uri,
+        'label': label,
+        'types': types,
+        'info': info,
+        'related_by_property': [],
+        'related_objects': related_objects,
+        'museum': museum,
+        'museum_items': [],
+        'shared_values': shared_values,
+    }
+    return profile, groups, siblings
+
+def _finish_profile(profile, groups, siblings):
+    for i, (prop, _, _) in enumerate(groups):
+        items = siblings.get(i, [])
+        if prop is None:
+            profile['museum_items'] = items
+        elif items:
+            profile['related_by_property'].append((prop, items))
+    return profile
+
+@metrics.timed
+def get_entity_profile(uri, data_props=DATA_PROPS, object_props=OBJECT_PROPS, concurrency=REQUEST_CONCURRENCY):
+    # Round trip 1: every outgoing triple of the entity, with labels of the linked resources
+    if USE_RELATED_INDEX:
+        ensure_indexes()
+    profile, groups, siblings = _plan_profile(uri, run_sparql(_profile_query(uri)), data_props, object_props)
+
+    # Round trip 2: reverse lookups for every shared value, each branch keeping its own LIMIT, in at most
+    # `concurrency` UNION queries dispatched together
+    pending = [i for i in range(len(groups)) if i not in siblings]
+    batches = [pending[k::concurrency] for k in range(min(concurrency, len(pending)))]
+    for rows in run_sparql_many([_siblings_query(uri, groups, b) for b in batches]):
+        _add_siblings(siblings, rows)
+
+    return _finish_profile(profile, groups, siblings)
+
+async def run_sparql_async(query):
+    full_query = PREFIXES + query
+    start = time.perf_counter()
+    rows = cache.get(full_query)
+    cached = rows is not None
+    if not cached:
+        rows = await client.query_async(full_query)
+        cache.put(full_query, rows)
+    metrics.observe_query(query, time.perf_counter() - start, len(rows), cached)
+    return rows
+
+@metrics.timed
+async def get_entity_profile_async(uri, data_props=DATA_PROPS, object_props=OBJECT_PROPS,
+                                   concurrency=REQUEST_CONCURRENCY):
+    # Same profile as get_entity_profile; the reverse lookups are spread over at most
+    # `concurrency` UNION queries that are awaited together
+    if USE_RELATED_INDEX:
+        await asyncio.to_thread(ensure_indexes)
+    rows = await run_sparql_async(_profile_query(uri))
+    profile, groups, siblings = _plan_profile(uri, rows, data_props, object_props)
+
+    pending = [i for i in range(len(groups)) if i not in siblings]
+    batches = [pending[k::concurrency] for k in range(min(concurrency, len(pending)))]
+    for rows in await asyncio.gather(*(run_sparql_async(_siblings_query(uri, groups, b)) for b in batches)):
+        _add_siblings(siblings, rows)
+
+    return _finish_profile(profile, groups, siblings)
+
+def list_profile_entities():
+    rows = run_sparql_uncached("""
+    SELECT DISTINCT ?s WHERE {
+        { ?s a owl:NamedIndividual } UNION { VALUES ?p { rdfs:label ex:hasName } ?s ?p ?label }
+    }
+    """)
+    return sorted(r['s']['value'] for r in rows if r['s']['type'] == 'uri')
+
+_SHARED_PROPS = ' '.join(f'ex:{prop}' for prop in DATA_PROPS + ['exhibitedIn'])
+
+def affected_entities(triples):
+    # Pages that can show any of the new triples: their subjects' own pages, pages listing items that
+    # share a value the triples add, and pages listing or linking to a subject whose label changed
+    affected, relabelled, shared = set(), set(), set()
+    for s, p, o in triples:
+        uri, p = str(s), str(p)
+        if not _safe_uri(uri):
+            continue
+        affected.add(uri)
+        prop = p[len(EX):] if p.startswith(EX) else None
+        if p == RDFS_LABEL or prop == 'hasName':
+            relabelled.add(uri)
+        if prop in DATA_PROPS or prop == 'exhibitedIn':
+            shared.add((prop, o.n3()))
+    for uri in relabelled:
+        rows = run_sparql_uncached(f"""
+    SELECT DISTINCT ?x WHERE {{
+        {{ ?x ?p <{uri}> }} UNION {{ VALUES ?q {{ {_SHARED_PROPS} }} <{uri}> ?q ?v . ?x ?q ?v }}
     }}
-    """
-    result = run_sparql(query)
-    return [r['type']['value'].split('/')[-1] for r in result]
+    """)
+        affected.update(r['x']['value'] for r in rows if r['x']['type'] == 'uri')
+    for prop, term in shared:
+        rows = run_sparql_uncached(f"SELECT DISTINCT ?x WHERE {{ ?x ex:{prop} {term} }}")
+        affected.update(r['x']['value'] for r in rows if r['x']['type'] == 'uri')
+    return affected
 
-def get_related_by_property(uri, prop):
-    query = f"""
-    SELECT ?val WHERE {{ <{uri}> ex:{prop} ?val }} LIMIT 1
-    """
-    result = run_sparql(query)
-    if not result:
-        return []
-    val = result[0]['val']['value']
-    val_str = f"<{val}>" if val.startswith("http") else f'"{val}"'
-    query2 = f"""
-    SELECT ?s ?label WHERE {{
-        ?s ex:{prop} {val_str} .
-        OPTIONAL {{ ?s rdfs:label ?label }}
-        OPTIONAL {{ ?s ex:hasName ?label }}
-        FILTER(?s != <{uri}>)
-    }} LIMIT 10
-    """
-    result2 = run_sparql(query2)
-    return [(r['label']['value'] if 'label' in r else r['s']['value'].split('/')[-1]) for r in result2]
-
-def get_related_objects(uri, properties):
-    all_related = []
-    for prop in properties:
-        query = f"""
-        SELECT ?obj ?label WHERE {{
-            <{uri}> ex:{prop} ?obj .
-            OPTIONAL {{ ?obj rdfs:label ?label }}
-            OPTIONAL {{ ?obj ex:hasName ?label }}
-        }} LIMIT 10
-        """
-        results = run_sparql(query)
-        if results:
-            all_related.append((prop, [(r['label']['value'] if 'label' in r else r['obj']['value'].split('/')[-1]) for r in results]))
-    return all_related
-
-def get_items_displayed_in_same_museum(uri):
+profile_store = ProfileStore(PROFILE_STORE) if PROFILE_STORE else None
+profile_refresher = ProfileRefresher(
+    profile_store, get_entity_profile, list_profile_entities, affected_entities, dataset_version,
+    PROFILE_DELTA_FILES, interval=PROFILE_REFRESH_INTERVAL, invalidate=cache.invalidate,
+) if profile_store else None
+
+if profile_store:
+    metrics.gauge('profile_store_entries', 'Entity pages held in the profile store', lambda: profile_store.stats()['profiles'])
+    metrics.gauge('profile_store_pending', 'Entity pages waiting to be rebuilt', lambda: profile_store.stats()['pending'])
+
+@metrics.timed
+def get_stored_profile(uri):
+    if profile_store is None:
+        return None
+    return profile_store.get(uri, dataset_version())
+
+def _first_value(uri, prop):
+    if USE_RELATED_INDEX and prop in related_index.properties:
+        ensure_indexes()
+        return related_index.first_value(uri, prop)
+    rows = run_sparql(_first_value_query(uri, prop))
+    return term_key(rows[0]['val']) if rows else None
+
+@metrics.timed
+def get_items_with_value(prop, value, exclude=None, after=None, limit=API_PAGE_SIZE):
+    # Subjects whose `prop` is the term `value` (a term_key), in URI order and starting after the URI
+    # `after`, so pages stay stable while the dataset does
+    if USE_RELATED_INDEX and prop in related_index.properties:
+        ensure_indexes()
+        subjects = related_index.sorted_subjects(prop, value)
+        items = []
+        i = bisect.bisect_right(subjects, after) if after else 0
+        while i < len(subjects) and len(items) < limit:
+            if subjects[i] != exclude:
+                items.append(_index_item(subjects[i]))
+            i += 1
+        return items
+    filters = ''
+    if exclude:
+        filters += f"FILTER(?s != <{exclude}>) "
+    if after:
+        filters += f"FILTER(STR(?s) > {sparql_literal(after)})"
     query = f"""
-    SELECT ?museum WHERE {{ <{uri}> ex:exhibitedIn ?museum }} LIMIT 1
-    """
-    results = run_sparql(query)
-    if not results:
-        return (None, [])
-    museum_uri = results[0]['museum']['value']
-    museum_label = get_label(museum_uri)
-    query2 = f"""
-    SELECT ?item ?label WHERE {{
-        ?item ex:exhibitedIn <{museum_uri}> .
-        OPTIONAL {{ ?item rdfs:label ?label }}
-        OPTIONAL {{ ?item ex:hasName ?label }}
-        FILTER(?item != <{uri}>)
-    }} LIMIT 15
+    SELECT ?s (SAMPLE(?name) AS ?label) WHERE {{
+        ?s ex:{prop} {sparql_term(value)} .
+        OPTIONAL {{ ?s rdfs:label ?name }}
+        OPTIONAL {{ ?s ex:hasName ?name }}
+        {filters}
+    }} GROUP BY ?s ORDER BY ?s LIMIT {limit}
     """
-    items = run_sparql(query2)
-    return museum_label, [(r['label']['value'] if 'label' in r else r['item']['value'].split('/')[-1]) for r in items]
+    return [_item(r, 's') for r in run_sparql(query)]
+
+@metrics.timed
+def get_related_page(uri, prop, value=None, after=None, limit=API_PAGE_SIZE):
+    # Everything sharing `value` (by default the entity's first value of `prop`) with the entity;
+    # one extra row tells whether a next page exists
+    if value is None:
+        value = _first_value(uri, prop)
+        if value is None:
+            return None, [], None
+    items = get_items_with_value(prop, value, exclude=uri, after=after, limit=limit + 1)
+    cursor = encode_cursor(items[limit - 1]['uri']) if len(items) > limit else None
+    return value, items[:limit], cursor
+
+def encode_cursor(uri):
+    return base64.urlsafe_b64encode(uri.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        return base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8') or None
+    except ValueError:
+        return None
 
 @app.route('/', methods=['GET', 'POST'])
-def home():
+async def home():
     result_html = ''
     if request.method == 'POST':
         name = request.form.get('name', '').strip()
         if not name:
             result_html = "<p style='color:red;'>Please enter a cultural entity name.</p>"
         else:
-            uri = get_entity_uri(name)
+            uri = await asyncio.to_thread(get_entity_uri, name)
             if not uri:
                 result_html = f"<p>No cultural entity found matching '<strong>{name}</strong>'.</p>"
             else:
-                label = get_label(uri)
-                types = get_entity_types(uri)
-                info = get_entity_info(uri)
+                profile = get_stored_profile(uri) or await get_entity_profile_async(uri)
 
-                result_html += f"<h3>{label}</h3>"
-                result_html += f"<p><strong>Type:</strong> {', '.join(types)}</p>"
+                result_html += f"<h3>{profile['label']}</h3>"
+                result_html += f"<p><strong>Type:</strong> {', '.join(profile['types'])}</p>"
 
-                if info:
+                if profile['info']:
                     result_html += "<h4>Details:</h4><ul>"
-                    for k, vlist in info.items():
+                    for k, vlist in profile['info'].items():
                         for v in vlist:
                             result_html += f"<li><b>{k.replace('_',' ').capitalize()}</b>: {v}</li>"
                     result_html += "</ul>"
 
-                data_props = [
-                    'hasArchitecturalStyle', 'hasConstructionDate', 'hasCreator', 'hasCulturalContext',
-                    'hasCulturalHeritageStatus', 'hasCulturalSignificance', 'hasDateOfDiscovery',
-                    'hasEventDuration', 'hasExactDate', 'hasLanguage', 'hasLocationType',
-                    'hasMaterial', 'hasName', 'hasPeriodOfUse', 'hasReligion',
-                    'hasRestorationDate', 'hasStartDate', 'hasUNESCODesignation', 'hasWebsite',
-                    'hasLocation'
-                ]
-
-                for related_prop in data_props:
-                    related_items = get_related_by_property(uri, related_prop)
-                    if related_items:
-                        result_html += f"<h4>Related by {related_prop.replace('has','').capitalize()}:</h4><ul>"
-                        for item in related_items:
-                            result_html += f"<li>{item}</li>"
-                        result_html += "</ul>"
+                for related_prop, related_items in profile['related_by_property']:
+                    result_html += f"<h4>Related by {related_prop.replace('has','').capitalize()}:</h4><ul>"
+                    for item in related_items:
+                        result_html += f"<li>{item['label']}</li>"
+                    result_html += "</ul>"
 
-                object_props = [
-                    'displays', 'commemorates', 'exhibitedIn', 'associatedWithEvent',
-                    'locatedIn', 'originatedFrom', 'datedFrom',
-                    'hasHistoricalPeriod', 'occurredIn', 'occurredOn', 'isPartOf'
-                ]
-                object_related = get_related_objects(uri, object_props)
-                for prop, items in object_related:
+                for prop, items in profile['related_objects']:
                     if items:
                         result_html += f"<h4>Related via {prop}:</h4><ul>"
                         for item in items:
-                            result_html += f"<li>{item}</li>"
+                            result_html += f"<li>{item['label']}</li>"
                         result_html += "</ul>"
 
-                museum_label, museum_items = get_items_displayed_in_same_museum(uri)
-                if museum_label:
-                    result_html += f"<h4>Displayed in: {museum_label}</h4>"
+                museum, museum_items = profile['museum'], profile['museum_items']
+                if museum:
+                    result_html += f"<h4>Displayed in: {museum['label']}</h4>"
                 if museum_items:
                     result_html += f"<h5>Other items in this museum:</h5><ul>"
                     for item in museum_items:
-                        result_html += f"<li>{item}</li>"
+                        result_html += f"<li>{item['label']}</li>"
                     result_html += "</ul>"
 
     return render_template_string("""
@@ -205,5 +585,254 @@ def home():
 </html>
 """, result_html=result_html)
 
+@app.route('/api/autocomplete', methods=['GET'])
+def autocomplete():
+    prefix = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    if not prefix:
+        return jsonify([])
+    ensure_indexes()
+    matches = search_index.complete(prefix, limit)
+    return jsonify([{'uri': uri, 'label': label} for uri, label in matches])
+
+_UNSAFE_URI_CHARS = set(' <>"{}|^`\\')
+_LANG_RE = re.compile(r'^[A-Za-z]+(-[A-Za-z0-9]+)*$')
+
+def _api_error(status, message):
+    return jsonify({'error': message}), status
+
+def _safe_uri(uri):
+    return uri.startswith('http') and not _UNSAFE_URI_CHARS.intersection(uri)
+
+def _api_property(name):
+    return name if name in DATA_PROPS or name in OBJECT_PROPS else None
+
+def _api_entity_uri():
+    # ?uri= is taken as given (after a sanity check), ?name= goes through the search index
+    uri = request.args.get('uri', '').strip()
+    if uri:
+        return uri if _safe_uri(uri) else None
+    name = request.args.get('name', '').strip()
+    return get_entity_uri(name) if name else None
+
+def _api_value(value, allow_uri=True):
+    # ?value= as a term key: an IRI when it looks like one, otherwise a literal, typed by ?datatype=
+    # or tagged by ?lang= when given. None when any of them is malformed
+    datatype = request.args.get('datatype') or None
+    lang = request.args.get('lang') or None
+    if (datatype and not _safe_uri(datatype)) or (lang and not _LANG_RE.match(lang)):
+        return None
+    if allow_uri and value.startswith('http') and not datatype and not lang:
+        return value if _safe_uri(value) else None
+    return literal_key(value, datatype, lang)
+
+def _value_args(key):
+    # The ?value= (and ?datatype=/?lang=) arguments naming a term key
+    value, datatype, lang = split_key(key)
+    args = {'value': value}
+    if datatype:
+        args['datatype'] = datatype
+    if lang:
+        args['lang'] = lang
+    return args
+
+def _with_cache_headers(response):
+    # Responses only change with the dataset, so its version is the ETag
+    version = dataset_version()
+    if version:
+        response.set_etag(version)
+    modified = dataset_modified()
+    if modified:
+        response.last_modified = modified
+    response.cache_control.public = True
+    response.cache_control.max_age = API_MAX_AGE
+    return response
+
+def _not_modified():
+    # Answered before any query runs when the client's copy is still current
+    response = _with_cache_headers(Response()).make_conditional(request)
+    return response if response.status_code == 304 else None
+
+def _profile_json(profile):
+    uri = profile['uri']
+    related = [{
+        'property': prop,
+        'items': items,
+        'next': url_for('related_items', uri=uri, property=prop, **_value_args(profile['shared_values'][prop])),
+    } for prop, items in profile['related_by_property']]
+    return {
+        'uri': uri,
+        'label': profile['label'],
+        'types': profile['types'],
+        'details': profile['info'],
+        'related': related,
+        'objects': [{'property': prop, 'items': items} for prop, items in profile['related_objects']],
+        'museum': profile['museum'],
+        'museum_items': profile['museum_items'],
+        'museum_next': (url_for('related_items', uri=uri, property='exhibitedIn', value=profile['museum']['uri'])
+                        if profile['museum'] else None),
+    }
+
+@app.route('/api/entity', methods=['GET'])
+def entity():
+    not_modified = _not_modified()
+    if not_modified:
+        return not_modified
+    uri = _api_entity_uri()
+    if not uri:
+        return _api_error(404, 'No matching entity')
+    profile = get_stored_profile(uri) or get_entity_profile(uri)
+    if not profile['types'] and not profile['info'] and not profile['related_objects']:
+        return _api_error(404, 'No matching entity')
+    return _with_cache_headers(jsonify(_profile_json(profile)))
+
+@app.route('/api/entity/related', methods=['GET'])
+def related_items():
+    prop = _api_property(request.args.get('property', ''))
+    if not prop:
+        return _api_error(400, 'Unknown property')
+    limit = max(1, min(request.args.get('limit', API_PAGE_SIZE, type=int), API_MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor')
+    after = decode_cursor(cursor) if cursor else None
+    if cursor and after is None:
+        return _api_error(400, 'Invalid cursor')
+    value = request.args.get('value')
+    if value:
+        value = _api_value(value)
+        if value is None:
+            return _api_error(400, 'Invalid value')
+    not_modified = _not_modified()
+    if not_modified:
+        return not_modified
+    uri = _api_entity_uri()
+    if not uri:
+        return _api_error(404, 'No matching entity')
+    value, items, next_cursor = get_related_page(uri, prop, value or None, after, limit)
+    return _with_cache_headers(jsonify({
+        'uri': uri,
+        'property': prop,
+        **(_value_args(value) if value else {'value': None}),
+        'items': items,
+        'next_cursor': next_cursor,
+        'next': (url_for('related_items', uri=uri, property=prop, limit=limit, cursor=next_cursor, **_value_args(value))
+                 if next_cursor else None),
+    }))
+
+@app.route('/api/items', methods=['GET'])
+def items_with_value():
+    # Every individual whose property has the given value (e.g. everything locatedIn a region), as NDJSON
+    prop = _api_property(request.args.get('property', 'locatedIn'))
+    if not prop:
+        return _api_error(400, 'Unknown property')
+    not_modified = _not_modified()
+    if not_modified:
+        return not_modified
+    literal = request.args.get('value')
+    if literal is not None:
+        value = _api_value(literal, allow_uri=False)
+        if value is None:
+            return _api_error(400, 'Invalid value')
+    else:
+        value = _api_entity_uri()
+        if not value:
+            return _api_error(404, 'No matching entity')
+
+    def generate():
+        after = None
+        while True:
+            batch = get_items_with_value(prop, value, after=after, limit=API_STREAM_BATCH)
+            for item in batch:
+                yield json.dumps(item, ensure_ascii=False) + '\n'
+            if len(batch) < API_STREAM_BATCH:
+                return
+            after = batch[-1]['uri']
+
+    return _with_cache_headers(Response(stream_with_context(generate()), mimetype='application/x-ndjson'))
+
+@app.before_request
+def start_request_timing():
+    if SERVER_TIMING:
+        g.timings = metrics.start_request()
+
+@app.before_request
+def start_profile_refresher():
+    # Started with the first request, so every worker process gets its own thread (only one refreshes)
+    if profile_refresher is not None and PROFILE_REFRESH_INTERVAL > 0:
+        profile_refresher.start()
+
+@app.after_request
+def add_server_timing(response):
+    timings = g.get('timings')
+    if timings is not None:
+        response.headers['Server-Timing'] = metrics.server_timing(timings)
+    return response
+
+def _require_admin():
+    if ADMIN_TOKEN:
+        if request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+            abort(403)
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        abort(403)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    _require_admin()
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/cache', methods=['GET'])
+def cache_stats():
+    _require_admin()
+    return jsonify(cache.stats())
+
+@app.route('/admin/indexes', methods=['GET'])
+def index_stats():
+    _require_admin()
+    return jsonify({
+        'search': {'entries': len(search_index), 'version': search_index.version},
+        'related': dict(related_index.memory_usage(), version=related_index.version),
+    })
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_dataset():
+    _require_admin()
+    if SPARQL_BACKEND == "embedded":
+        client.reload()
+    cache.invalidate(dataset_version())
+    search_index.invalidate()
+    related_index.invalidate()
+    return jsonify(cache.stats())
+
+@app.route('/admin/profiles', methods=['GET'])
+def profile_stats():
+    _require_admin()
+    if profile_store is None:
+        return _api_error(404, 'PROFILE_STORE is disabled')
+    return jsonify(dict(profile_store.stats(), refreshed=profile_refresher.refreshed))
+
+@app.route('/admin/profiles/refresh', methods=['POST'])
+def refresh_profiles():
+    # Rebuilds the pages of the given entities (?uri=, repeatable), or of every entity, in the background.
+    # For data loaded into Fuseki by other means, since the cached query results go too
+    _require_admin()
+    if profile_store is None:
+        return _api_error(404, 'PROFILE_STORE is disabled')
+    uris = request.values.getlist('uri')
+    if not all(_safe_uri(uri) for uri in uris):
+        return _api_error(400, 'Invalid uri')
+    cache.invalidate(dataset_version())
+    if uris:
+        profile_store.queue(uris)
+    else:
+        profile_refresher.plan(dataset_version(), full=True)
+    profile_refresher.start()
+    profile_refresher.wake()
+    return jsonify(profile_store.stats())
+
+@app.route('/admin/cache/invalidate', methods=['POST'])
+def invalidate_cache():
+    _require_admin()
+    cache.invalidate(dataset_version())
+    return jsonify(cache.stats())
+
 if __name__ == '__main__':
     app.run(debug=True, port=5002)